@@ -1,12 +1,22 @@
 import sys
 from pathlib import Path
+from typing import Literal
 from uuid import uuid4
 
 from loguru import logger
-from pydantic import UUID4
+from pydantic import UUID4, BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-__all__ = ("settings",)
+__all__ = ("RetryPolicy", "settings")
+
+
+class RetryPolicy(BaseModel):
+    """How `send_request` retries a failing upstream"""
+
+    max_attempts: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 30
+    retry_statuses: frozenset[int] = frozenset({408, 425, 429, 500, 502, 503, 504})
 
 
 class Settings(BaseSettings):
@@ -18,6 +28,8 @@ class Settings(BaseSettings):
 
     ETHERSCAN_API_BASE_URL: str = "https://api.etherscan.io/api"
     ETHERSCAN_API_KEY: str = ""
+    # rows per page of paginated Etherscan queries, 10k divided by it is the number of pages per block window
+    ETHERSCAN_PAGE_SIZE: int = 2500
     CMC_API_KEY: UUID4 = uuid4()
     OPEN_EXCHANGE_RATE_API_ID: str = ""
 
@@ -34,6 +46,90 @@ class Settings(BaseSettings):
     OPEN_EXCHANGE_RATE_DATA: Path = MEDIA_DIR / "open_exchange_rates.csv"
 
     DTON_API_KEY: str = ""
+    # long DTON time ranges are split into windows of this size, that many windows are paginated at the same time
+    DTON_WINDOW_SECONDS: int = 7 * 24 * 60 * 60
+    DTON_CONCURRENCY: int = 4
+
+    # wallets of a report processed at the same time
+    REPORT_WALLETS_CONCURRENCY: int = 5
+
+    # ERC-20 balances of a wallet fetched and priced at the same time
+    ETH_TOKEN_BALANCES_CONCURRENCY: int = 5
+    # ETH balances come from the Etherscan REST API or from batched calls to a JSON-RPC node (e.g. a local anvil)
+    ETH_BALANCES_BACKEND: Literal["etherscan", "rpc"] = "etherscan"
+    ETH_RPC_URL: str = "http://127.0.0.1:8545"
+    # past ETH balances are rebuilt backwards from Etherscan `txlist`
+    # or read at the target block, which needs ETH_RPC_URL to be an archive node
+    ETH_HISTORICAL_BALANCES: Literal["txlist", "archive"] = "txlist"
+    # calls per JSON-RPC batch and batches in flight
+    ETH_RPC_BATCH_SIZE: int = 100
+    ETH_RPC_CONCURRENCY: int = 4
+
+    # past TON balances are rebuilt backwards from DTON transactions
+    # or read from the account state at the masterchain block of the target date (needs archive liteservers)
+    TON_HISTORICAL_BALANCES: Literal["transactions", "liteserver"] = "transactions"
+    # the same for jettons: replayed from transfers or `get_wallet_data` of the jetton wallets at the block,
+    # the cross check also replays the transfers and logs the balances that differ
+    JETTON_HISTORICAL_BALANCES: Literal["transfers", "liteserver"] = "transfers"
+    JETTON_HISTORICAL_CROSS_CHECK: bool = False
+
+    # local ledger of balance changes per wallet, a past balance is a checkpoint minus the changes since then
+    LEDGER_ENABLED: bool = True
+    LEDGER_PATH: Path = MEDIA_DIR / "ledger.sqlite3"
+    # the tail of the synced range is fetched again, upstream indexers may still be catching up on it
+    LEDGER_RESYNC_SECONDS: int = 60 * 60
+
+    # shared HTTP clients, one connection pool per upstream host
+    HTTP_TIMEOUT: float = 10
+    HTTP_POOL_MAX_CONNECTIONS: int = 20
+    HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30
+    # hosts to talk HTTP/2 with, requires `h2` (`httpx[http2]`) to be installed
+    HTTP2_HOSTS: set[str] = set()
+
+    # per-host throttling: requests per second and max requests in flight
+    HTTP_RATE_LIMITS: dict[str, float] = {
+        "api.etherscan.io": 5,
+        "tonapi.io": 1,
+        "toncenter.com": 1,
+        "pro-api.coinmarketcap.com": 0.5,
+    }
+    HTTP_MAX_IN_FLIGHT: dict[str, int] = {}
+    HTTP_DEFAULT_MAX_IN_FLIGHT: int = 10
+
+    # retries with exponential backoff, per-host overrides of the default policy
+    HTTP_RETRY_POLICY: RetryPolicy = RetryPolicy()
+    HTTP_RETRY_POLICIES: dict[str, RetryPolicy] = {}
+    # circuit breaker: opens after N consecutive failures, probes again after the timeout
+    HTTP_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    HTTP_CIRCUIT_RESET_TIMEOUT: float = 30
+
+    # on-disk cache of upstream responses that do not change anymore
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_PATH: Path = MEDIA_DIR / "http_cache.sqlite3"
+    HTTP_CACHE_MAX_BYTES: int = 512 * 1024**2
+    # time windows that ended longer ago than this are considered final
+    HTTP_CACHE_SETTLE_SECONDS: int = 60 * 60
+
+    # ETH blocks and TON masterchain blocks looked up by settled timestamps are kept locally
+    BLOCK_INDEX_ENABLED: bool = True
+    BLOCK_INDEX_PATH: Path = MEDIA_DIR / "block_index.sqlite3"
+
+    # "record" stores every upstream answer (HTTP and liteserver) as a fixture, "replay" serves them back offline
+    UPSTREAM_FIXTURES_MODE: Literal["off", "record", "replay"] = "off"
+    UPSTREAM_FIXTURES_DIR: Path = MEDIA_DIR / "fixtures"
+    # seconds added to every replayed answer to simulate the upstream latency
+    UPSTREAM_REPLAY_LATENCY: float = 0
+
+    # the shared liteserver balancer is replaced when it does not answer a health check in time
+    LITE_HEALTH_CHECK_INTERVAL: float = 30
+    LITE_HEALTH_CHECK_TIMEOUT: float = 10
+    # liteserver queries in flight per report step and retries of a failing one
+    LITE_CONCURRENCY: int = 8
+    LITE_RETRY_POLICY: RetryPolicy = RetryPolicy(max_attempts=4)
+    # jetton wallet addresses never change, resolved ones are kept locally
+    JETTON_WALLETS_CACHE_ENABLED: bool = True
+    JETTON_WALLETS_CACHE_PATH: Path = MEDIA_DIR / "jetton_wallets.sqlite3"
 
     model_config = SettingsConfigDict(
         env_file=f"{ROOT_DIR}/.env",
@@ -6,6 +6,9 @@ from sentry_sdk import init as sentry_init
 from sentry_sdk.integrations.loguru import LoguruIntegration
 
 from src.config import settings
+from src.core.fixtures import is_replaying
+from src.core.http import http_clients
+from src.core.lite import lite_balancer
 from src.core.types.singleton import SingletonMeta
 from src.core.utils import create_media_if_not_exists
 from src.modules.metrics.routers import router as metrics_router
@@ -17,10 +20,15 @@ from .routers.v1 import router as api_v1_router
 async def _lifespan_on_startup(app: FastAPI) -> None:
     _ = app
     create_media_if_not_exists()
+    if not is_replaying():
+        # warm up: the first TON request should not pay for the liteserver handshakes
+        await lite_balancer.get()
 
 
 async def _lifespan_on_shutdown(app: FastAPI) -> None:
     _ = app
+    await http_clients.aclose()
+    await lite_balancer.aclose()
 
 
 @asynccontextmanager
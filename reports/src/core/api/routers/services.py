@@ -1,5 +1,10 @@
 from fastapi import APIRouter, status
 
+from src.core.dto import BaseDTO
+from src.core.http.retry import CircuitState, circuit_breakers
+from src.core.lite import lite_balancer
+from src.core.singleflight import singleflight_groups
+
 router = APIRouter(prefix="", tags=["services"])
 
 
@@ -15,3 +20,46 @@ async def trigger_error() -> float:
     status_code=status.HTTP_200_OK,
 )
 async def health_check() -> None: ...
+
+
+class UpstreamHealth(BaseDTO):
+    state: CircuitState
+    failures: int
+
+
+class SingleFlightStats(BaseDTO):
+    calls: int
+    coalesced: int
+
+
+@router.get(
+    "/health/upstreams/",
+    summary="Circuit breaker state of every upstream host",
+    status_code=status.HTTP_200_OK,
+)
+async def upstreams_health_check() -> dict[str, UpstreamHealth]:
+    return {
+        host: UpstreamHealth(state=breaker.state, failures=breaker.failures)
+        for host, breaker in circuit_breakers.items()
+    }
+
+
+@router.get(
+    "/health/singleflight/",
+    summary="How many upstream calls were coalesced with identical in-flight ones",
+    status_code=status.HTTP_200_OK,
+)
+async def singleflight_stats() -> dict[str, SingleFlightStats]:
+    return {
+        name: SingleFlightStats(calls=group.calls, coalesced=group.coalesced)
+        for name, group in singleflight_groups.items()
+    }
+
+
+@router.get(
+    "/health/liteservers/",
+    summary="Number of liteservers the shared balancer is connected to",
+    status_code=status.HTTP_200_OK,
+)
+async def liteservers_health_check() -> dict[str, int]:
+    return {"alive_peers": lite_balancer.alive_peers}
@@ -0,0 +1,117 @@
+"""
+Local index of blocks by timestamp, one per chain (ETH blocks, TON masterchain seqnos).
+
+The index keeps the answers of the upstream lookups by time as (timestamp, block) samples in a sqlite store,
+so a settled timestamp that was looked up once never needs the network again.
+Blocks only move forward in time, so a timestamp between two samples of the same block is answered locally too.
+Any other timestamp costs exactly one upstream lookup: refining a guess interpolated between samples would need
+at least one block fetch as well, which is never cheaper than the lookup itself.
+"""
+
+import json
+import sqlite3
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import Any, TypedDict
+
+from loguru import logger
+
+from src.config import settings
+from src.core.sqlite import connect
+
+__all__ = ("BlockIndex", "BlockSample", "block_index", "find_block", "is_indexable")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS block_lookups (
+    chain TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    data TEXT,
+    PRIMARY KEY (chain, timestamp)
+);
+"""
+
+
+class BlockSample(TypedDict):
+    timestamp: int
+    # the block the upstream lookup answers for `timestamp`
+    block: int
+    # whatever else the chain needs to address the block, e.g. the hashes of a TON block id
+    data: dict[str, Any] | None
+
+
+type LookupBlock = Callable[[int], Awaitable[BlockSample]]
+"""upstream lookup of the block at a timestamp, the sample is the block and the timestamp asked for"""
+
+
+def is_indexable(date_: datetime) -> bool:
+    """
+    blocks are indexed for settled dates only, and not while upstream fixtures are recorded or replayed
+    (fixtures are keyed by the upstream queries the code makes)
+    """
+    return (
+        settings.BLOCK_INDEX_ENABLED
+        and settings.UPSTREAM_FIXTURES_MODE == "off"
+        and _is_settled(int(date_.timestamp()))
+    )
+
+
+def _is_settled(timestamp: int) -> bool:
+    return timestamp < datetime.now(UTC).timestamp() - settings.HTTP_CACHE_SETTLE_SECONDS
+
+
+class BlockIndex:
+    __slots__ = ("_connection",)
+
+    def __init__(self) -> None:
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect(settings.BLOCK_INDEX_PATH, _SCHEMA)
+        return self._connection
+
+    def bracket(self, chain: str, timestamp: int) -> tuple[BlockSample | None, BlockSample | None]:
+        """the latest sample at or before `timestamp` and the earliest one after it"""
+        before = self.connection.execute(
+            "SELECT timestamp, block, data FROM block_lookups WHERE chain = ? AND timestamp <= ?"
+            " ORDER BY timestamp DESC LIMIT 1",
+            (chain, timestamp),
+        ).fetchone()
+        after = self.connection.execute(
+            "SELECT timestamp, block, data FROM block_lookups WHERE chain = ? AND timestamp > ?"
+            " ORDER BY timestamp LIMIT 1",
+            (chain, timestamp),
+        ).fetchone()
+        return _to_sample(before), _to_sample(after)
+
+    def add(self, chain: str, sample: BlockSample) -> None:
+        data = json.dumps(sample["data"]) if sample["data"] is not None else None
+        self.connection.execute(
+            "INSERT OR REPLACE INTO block_lookups VALUES (?, ?, ?, ?)",
+            (chain, sample["timestamp"], sample["block"], data),
+        )
+
+
+def _to_sample(row: tuple[int, int, str | None] | None) -> BlockSample | None:
+    if row is None:
+        return None
+    timestamp, block, data = row
+    return {"timestamp": timestamp, "block": block, "data": json.loads(data) if data is not None else None}
+
+
+block_index = BlockIndex()
+
+
+async def find_block(chain: str, timestamp: int, lookup_block: LookupBlock) -> BlockSample:
+    """the block of `chain` at `timestamp`, as answered by `lookup_block`"""
+    before, after = block_index.bracket(chain, timestamp)
+    if before is not None and (before["timestamp"] == timestamp or (after and after["block"] == before["block"])):
+        return before
+
+    logger.debug(f"{chain} block at {timestamp} is not in the index yet, looking it up upstream")
+    sample = await lookup_block(timestamp)
+    if _is_settled(timestamp):
+        block_index.add(chain, sample)
+    return sample
@@ -0,0 +1,24 @@
+from asyncio import Semaphore, gather
+from collections.abc import Awaitable, Iterable
+
+__all__ = ("gather_limited", "gather_limited_settled")
+
+
+def _limited[_T](aws: Iterable[Awaitable[_T]], limit: int) -> list[Awaitable[_T]]:
+    semaphore = Semaphore(limit)
+
+    async def run(aw: Awaitable[_T]) -> _T:
+        async with semaphore:
+            return await aw
+
+    return [run(aw) for aw in aws]
+
+
+async def gather_limited[_T](aws: Iterable[Awaitable[_T]], limit: int) -> list[_T]:
+    """like `asyncio.gather`, but at most `limit` awaitables run at the same time, results keep the input order"""
+    return await gather(*_limited(aws, limit))
+
+
+async def gather_limited_settled[_T](aws: Iterable[Awaitable[_T]], limit: int) -> list[_T | BaseException]:
+    """like `gather_limited`, but a failing awaitable does not stop the others, its exception is returned instead"""
+    return await gather(*_limited(aws, limit), return_exceptions=True)
@@ -1,8 +1,11 @@
 from enum import StrEnum
+from zoneinfo import ZoneInfo
 
 from src.config import settings
 
 DTON_URL: str = f"https://dton.co/{settings.DTON_API_KEY}/graphql"
+# DTON filters and returns `gen_utime` in Moscow time, not in UTC
+DTON_TIMEZONE = ZoneInfo("Europe/Moscow")
 
 
 class JettonActionType(StrEnum):
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any, Literal
 
 from pydantic import BaseModel, ConfigDict, RootModel
 
@@ -57,3 +58,27 @@ class JettonTransaction(BaseDTO):
 
 
 class JettonTransactionList(RootModel[list[JettonTransaction]]): ...
+
+
+class JsonRpcRequest(BaseDTO):
+    jsonrpc: Literal["2.0"] = "2.0"
+    id: int
+    method: str
+    params: list[Any]
+
+
+class JsonRpcBatch(RootModel[list[JsonRpcRequest]]): ...
+
+
+class JsonRpcError(BaseDTO):
+    code: int
+    message: str
+
+
+class JsonRpcResponse(BaseDTO):
+    id: int
+    result: Any = None
+    error: JsonRpcError | None = None
+
+
+class JsonRpcResponses(RootModel[list[JsonRpcResponse]]): ...
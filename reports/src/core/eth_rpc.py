@@ -0,0 +1,67 @@
+from itertools import batched
+from typing import Any
+
+from src.config import settings
+from src.core.concurrency import gather_limited
+from src.core.dto import JsonRpcBatch, JsonRpcRequest, JsonRpcResponses
+from src.core.exceptions import RequestException
+from src.core.http import send_request
+
+__all__ = ("RpcCall", "balance_of_call", "block_tag", "get_balance_call", "hex_to_int", "rpc_batch")
+
+type RpcCall = tuple[str, list[Any]]
+
+# keccak("balanceOf(address)")[:4]
+BALANCE_OF_SELECTOR = "0x70a08231"
+
+
+def block_tag(block: int | None = None) -> str:
+    return "latest" if block is None else hex(block)
+
+
+def get_balance_call(address: str, block: int | None = None) -> RpcCall:
+    return "eth_getBalance", [address, block_tag(block)]
+
+
+def balance_of_call(token_contract_address: str, address: str, block: int | None = None) -> RpcCall:
+    data = BALANCE_OF_SELECTOR + address.lower().removeprefix("0x").rjust(64, "0")
+    return "eth_call", [{"to": token_contract_address, "data": data}, block_tag(block)]
+
+
+def hex_to_int(value: str) -> int:
+    # `eth_call` to an address without code answers with an empty "0x"
+    return int(value, 16) if value not in ("", "0x") else 0
+
+
+async def rpc_batch(calls: list[RpcCall], operation: str = "eth_rpc.batch") -> list[Any]:
+    """
+    Results of JSON-RPC calls to `ETH_RPC_URL` in the order of `calls`.
+    Calls are sent as batches of `ETH_RPC_BATCH_SIZE`, up to `ETH_RPC_CONCURRENCY` batches at a time,
+    raises `RequestException` if any call fails or is left without a result.
+    """
+    chunks = batched(enumerate(calls), settings.ETH_RPC_BATCH_SIZE)
+    results: dict[int, Any] = {}
+    for chunk_results in await gather_limited(
+        (_send_batch(chunk, operation) for chunk in chunks), limit=settings.ETH_RPC_CONCURRENCY
+    ):
+        results |= chunk_results
+
+    if missing := [id_ for id_ in range(len(calls)) if id_ not in results]:
+        raise RequestException(f"JSON-RPC calls {missing} got no answer")
+    return [results[id_] for id_ in range(len(calls))]
+
+
+async def _send_batch(chunk: tuple[tuple[int, RpcCall], ...], operation: str) -> dict[int, Any]:
+    batch = JsonRpcBatch([JsonRpcRequest(id=id_, method=method, params=params) for id_, (method, params) in chunk])
+    response = await send_request("POST", settings.ETH_RPC_URL, data=batch, operation=operation)
+
+    # answers of a batch may come in any order
+    results: dict[int, Any] = {}
+    for answer in JsonRpcResponses.model_validate_json(response.content).root:
+        if answer.error is not None:
+            raise RequestException(f"JSON-RPC call {answer.id} failed: {answer.error.code} {answer.error.message}")
+        # a successful answer always has a result, a malformed error entry may have neither
+        if answer.result is None:
+            raise RequestException(f"JSON-RPC call {answer.id} answered without a result")
+        results[answer.id] = answer.result
+    return results
@@ -2,3 +2,9 @@ class BaseProjectException(BaseException): ...
 
 
 class RequestException(BaseProjectException): ...
+
+
+class CircuitOpenError(RequestException): ...
+
+
+class FixtureNotFoundError(RequestException): ...
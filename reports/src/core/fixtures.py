@@ -0,0 +1,42 @@
+"""
+Record/replay of upstream answers for offline runs, see `Settings.UPSTREAM_FIXTURES_MODE`.
+Every answer is stored as a json file named after the canonical hash of the request.
+"""
+
+import json
+from asyncio import sleep
+from typing import Any
+
+from src.config import settings
+from src.core.exceptions import FixtureNotFoundError
+
+__all__ = ("is_recording", "is_replaying", "load_fixture", "save_fixture")
+
+
+def is_recording() -> bool:
+    return settings.UPSTREAM_FIXTURES_MODE == "record"
+
+
+def is_replaying() -> bool:
+    return settings.UPSTREAM_FIXTURES_MODE == "replay"
+
+
+def save_fixture(kind: str, key: str, payload: dict[str, Any]) -> None:
+    path = settings.UPSTREAM_FIXTURES_DIR / kind / f"{key}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as file:
+        json.dump(payload, file, indent=2)
+
+
+async def load_fixture(kind: str, key: str) -> dict[str, Any]:
+    """load a recorded answer, simulating `UPSTREAM_REPLAY_LATENCY` of the upstream"""
+    path = settings.UPSTREAM_FIXTURES_DIR / kind / f"{key}.json"
+    if not path.exists():
+        raise FixtureNotFoundError(f"no recorded {kind} fixture {key}")
+
+    if settings.UPSTREAM_REPLAY_LATENCY:
+        await sleep(settings.UPSTREAM_REPLAY_LATENCY)
+
+    with path.open() as file:
+        payload: dict[str, Any] = json.load(file)
+    return payload
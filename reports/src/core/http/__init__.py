@@ -0,0 +1,4 @@
+from .clients import http_clients
+from .request import send_request
+
+__all__ = ("http_clients", "send_request")
@@ -0,0 +1,173 @@
+import json
+import sqlite3
+from datetime import UTC, datetime
+from hashlib import sha256
+from math import inf
+from time import time
+from typing import Final
+
+from httpx import URL, QueryParams, Request, Response
+
+from src.config import settings
+from src.core.sqlite import connect
+
+__all__ = (
+    "IMMUTABLE",
+    "WIRE_HEADERS",
+    "ResponseCache",
+    "is_cacheable",
+    "request_key",
+    "response_cache",
+    "ttl_for_window",
+)
+
+IMMUTABLE: Final = inf
+"""`cache_ttl` for responses that never change"""
+
+# query params that authenticate the caller but do not change the response
+_SECRET_PARAMS = frozenset({"apikey", "app_id"})
+# headers describing the wire encoding, cached and recorded contents are already decoded
+WIRE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def request_key(method: str, url: str, params: QueryParams | None = None, body: object = None) -> str:
+    """canonical hash of a request, independent of param order and API keys"""
+    full_url = URL(url, params=params)
+    canonical_params = sorted((key, value) for key, value in full_url.params.multi_items() if key not in _SECRET_PARAMS)
+    path = full_url.path
+    if settings.DTON_API_KEY:
+        path = path.replace(settings.DTON_API_KEY, "")
+
+    canonical = json.dumps(
+        [method.upper(), full_url.host, path, canonical_params, body],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return sha256(canonical.encode()).hexdigest()
+
+
+# error envelopes are tiny, anything bigger is a payload and is not worth decoding here
+_ERROR_ENVELOPE_MAX_BYTES = 4096
+
+
+def is_cacheable(response: Response) -> bool:
+    """
+    upstreams report some failures with 200 OK: GraphQL `errors` (DTON)
+    and `status: "0"` envelopes (Etherscan rate limits), those must not be cached
+    """
+    if len(response.content) > _ERROR_ENVELOPE_MAX_BYTES:
+        return True
+
+    try:
+        data = response.json()
+    except ValueError:
+        return True
+
+    if not isinstance(data, dict):
+        return True
+    if data.get("errors"):
+        return False
+    return not (data.get("status") == "0" and data.get("message") != "No transactions found")
+
+
+def ttl_for_window(window_end: datetime) -> float | None:
+    """
+    `cache_ttl` for a request over a time window:
+    immutable once the window is settled on chain, not cached otherwise
+    """
+    settled_before = datetime.now(UTC).timestamp() - settings.HTTP_CACHE_SETTLE_SECONDS
+    return IMMUTABLE if window_end.timestamp() < settled_before else None
+
+
+class ResponseCache:
+    """
+    On-disk cache of successful upstream responses keyed by `request_key`.
+    Entries are either immutable or expire after their TTL,
+    least recently used ones are evicted once the store outgrows `HTTP_CACHE_MAX_BYTES`.
+    """
+
+    __slots__ = ("_connection",)
+
+    def __init__(self) -> None:
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect(settings.HTTP_CACHE_PATH, _SCHEMA)
+        return self._connection
+
+    def get(self, key: str, request: Request) -> Response | None:
+        now = time()
+        row = self.connection.execute(
+            "SELECT status, headers, content, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, headers, content, expires_at = row
+        if expires_at is not None and expires_at < now:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+        self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return Response(status, headers=json.loads(headers), content=content, request=request)
+
+    def put(self, key: str, response: Response, ttl: float) -> None:
+        if not is_cacheable(response):
+            return
+
+        now = time()
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in WIRE_HEADERS]
+        content = response.content
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                response.status_code,
+                json.dumps(headers),
+                content,
+                len(content),
+                None if ttl == IMMUTABLE else now + ttl,
+                now,
+            ),
+        )
+        self._evict()
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM responses")
+
+    def _evict(self) -> None:
+        if self._total_size() <= settings.HTTP_CACHE_MAX_BYTES:
+            return
+
+        self.connection.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (time(),))
+        excess = self._total_size() - settings.HTTP_CACHE_MAX_BYTES * 0.9
+        to_delete: list[tuple[str]] = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            to_delete.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def _total_size(self) -> int:
+        (total,) = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return int(total)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,51 @@
+from importlib.util import find_spec
+
+from httpx import URL, AsyncClient, Limits
+from loguru import logger
+
+from src.config import settings
+
+__all__ = ("HttpClients", "http_clients")
+
+_HTTP2_AVAILABLE = find_spec("h2") is not None
+
+
+class HttpClients:
+    """Pooled `AsyncClient` per upstream host, kept alive for the app lifetime"""
+
+    __slots__ = ("_clients",)
+
+    def __init__(self) -> None:
+        self._clients: dict[str, AsyncClient] = {}
+
+    def get(self, url: str) -> AsyncClient:
+        host = URL(url).host
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = self._clients[host] = self._create_client(host)
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    @staticmethod
+    def _create_client(host: str) -> AsyncClient:
+        http2 = host in settings.HTTP2_HOSTS
+        if http2 and not _HTTP2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for {host}, but `h2` is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+        return AsyncClient(
+            timeout=settings.HTTP_TIMEOUT,
+            http2=http2,
+            limits=Limits(
+                max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+http_clients = HttpClients()
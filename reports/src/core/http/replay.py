@@ -0,0 +1,35 @@
+from base64 import b64decode, b64encode
+
+from httpx import Request, Response
+
+from src.core.fixtures import load_fixture, save_fixture
+
+from .cache import WIRE_HEADERS
+
+__all__ = ("record_response", "replay_response")
+
+_FIXTURES_KIND = "http"
+
+
+def record_response(key: str, response: Response) -> None:
+    save_fixture(
+        _FIXTURES_KIND,
+        key,
+        {
+            # for humans only, API keys are not stored
+            "request": f"{response.request.method} {response.request.url.host}",
+            "status": response.status_code,
+            "headers": [(name, value) for name, value in response.headers.items() if name.lower() not in WIRE_HEADERS],
+            "content": b64encode(response.content).decode(),
+        },
+    )
+
+
+async def replay_response(key: str, request: Request) -> Response:
+    fixture = await load_fixture(_FIXTURES_KIND, key)
+    return Response(
+        fixture["status"],
+        headers=fixture["headers"],
+        content=b64decode(fixture["content"]),
+        request=request,
+    )
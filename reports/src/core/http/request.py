@@ -0,0 +1,152 @@
+from asyncio import sleep
+from functools import partial
+from time import perf_counter
+from typing import Any, Literal
+
+from httpx import URL, Headers, QueryParams, Request, Response, TransportError
+from loguru import logger
+from pydantic import BaseModel
+
+from src.config import settings
+from src.core.fixtures import is_recording, is_replaying
+from src.core.metrics import (
+    UPSTREAM_BYTES,
+    UPSTREAM_CACHE_HITS,
+    UPSTREAM_LATENCY,
+    UPSTREAM_RETRIES,
+)
+from src.core.singleflight import SingleFlight, singleflight_groups
+
+from .cache import request_key, response_cache
+from .clients import http_clients
+from .replay import record_response, replay_response
+from .retry import backoff_delay, circuit_breaker, retry_policy
+from .throttling import throttle
+
+__all__ = ("send_request",)
+
+_Method = Literal["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+_requests = singleflight_groups["send_request"] = SingleFlight("send_request")
+
+
+async def send_request(
+    method: _Method,
+    url: str,
+    params: QueryParams | None = None,
+    data: BaseModel | None = None,
+    headers: Headers | None = None,
+    follow_redirects: bool = False,
+    no_retries: bool = False,
+    cache_ttl: float | None = None,
+    operation: str = "other",
+) -> Response:
+    """
+    Send a request through the pooled client of the upstream host.
+    Transport errors and retryable statuses are retried according to the host's `RetryPolicy`,
+    the last error is raised once attempts are exhausted.
+    Raises `CircuitOpenError` without hitting the network while the host's circuit is open.
+    With `cache_ttl` (seconds or `IMMUTABLE`) successful responses are served from the on-disk cache.
+    Identical GET and cacheable requests that are in flight at the same time share a single upstream call.
+    Answers are recorded to or replayed from fixtures according to `UPSTREAM_FIXTURES_MODE`.
+    Every attempt is measured per host and `operation` (e.g. `etherscan.tokentx`) and exposed on `/metrics`.
+    """
+    body = data.model_dump(mode="json") if data is not None else None
+    key = request_key(method, url, params, body)
+    if is_replaying():
+        return await replay_response(key, Request(method, URL(url, params=params)))
+
+    send = partial(
+        _send_request,
+        method=method,
+        url=url,
+        params=params,
+        body=body,
+        headers=headers,
+        follow_redirects=follow_redirects,
+        no_retries=no_retries,
+        cache_ttl=cache_ttl,
+        cache_key=key,
+        operation=operation,
+    )
+    if method == "GET" or cache_ttl is not None:
+        response = await _requests.do((key, follow_redirects, no_retries), send)
+    else:
+        response = await send()
+
+    if is_recording():
+        record_response(key, response)
+    return response
+
+
+async def _send_request(
+    *,
+    method: _Method,
+    url: str,
+    params: QueryParams | None,
+    body: Any,
+    headers: Headers | None,
+    follow_redirects: bool,
+    no_retries: bool,
+    cache_ttl: float | None,
+    cache_key: str,
+    operation: str,
+) -> Response:
+    host = URL(url).host
+    use_cache = cache_ttl is not None and settings.HTTP_CACHE_ENABLED
+    if use_cache and (cached := response_cache.get(cache_key, Request(method, URL(url, params=params)))) is not None:
+        UPSTREAM_CACHE_HITS.inc(host, operation)
+        return cached
+
+    client = http_clients.get(url)
+    host_throttle = throttle(host)
+    breaker = circuit_breaker(host)
+    policy = retry_policy(host)
+    max_attempts = 1 if no_retries else policy.max_attempts
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if attempt > 1:
+            UPSTREAM_RETRIES.inc(host, operation)
+        probe = breaker.check()
+        try:
+            async with host_throttle.slot():
+                started_at = perf_counter()
+                response = await client.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    json=body,
+                    headers=headers,
+                    follow_redirects=follow_redirects,
+                )
+        except TransportError as e:
+            UPSTREAM_LATENCY.observe(host, operation, type(e).__name__, value=perf_counter() - started_at)
+            breaker.record_failure()
+            if attempt == max_attempts:
+                raise
+            logger.warning(f"{method} {url} -> {e!r}, attempt {attempt}/{max_attempts}")
+            await sleep(backoff_delay(policy, attempt))
+            continue
+        except BaseException:
+            breaker.release(probe)
+            raise
+
+        UPSTREAM_LATENCY.observe(host, operation, str(response.status_code), value=perf_counter() - started_at)
+        UPSTREAM_BYTES.observe(host, operation, value=len(response.content))
+        if response.is_server_error:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if response.is_success:
+            if use_cache and cache_ttl is not None:
+                response_cache.put(cache_key, response, cache_ttl)
+            return response
+
+        if attempt == max_attempts or response.status_code not in policy.retry_statuses:
+            response.raise_for_status()
+
+        logger.warning(f"{method} {url} -> {response.status_code}, attempt {attempt}/{max_attempts}")
+        await sleep(backoff_delay(policy, attempt, response))
@@ -0,0 +1,121 @@
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from enum import StrEnum
+from random import uniform
+from time import monotonic
+
+from httpx import Response
+
+from src.config import RetryPolicy, settings
+from src.core.exceptions import CircuitOpenError
+
+__all__ = ("CircuitBreaker", "CircuitState", "backoff_delay", "circuit_breaker", "circuit_breakers", "retry_policy")
+
+
+def retry_policy(host: str) -> RetryPolicy:
+    return settings.HTTP_RETRY_POLICIES.get(host, settings.HTTP_RETRY_POLICY)
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int, response: Response | None = None) -> float:
+    """
+    exponential backoff with full jitter for the given (1-based) attempt.
+    `Retry-After` of the response wins if it asks to wait longer.
+    """
+    delay = uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** (attempt - 1)))
+    if response is not None and (retry_after := _parse_retry_after(response)) is not None:
+        delay = max(delay, min(retry_after, policy.backoff_max))
+    return delay
+
+
+def _parse_retry_after(response: Response) -> float | None:
+    if not (value := response.headers.get("Retry-After")):
+        return None
+
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, float((retry_at - datetime.now(UTC)).total_seconds()))
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream host is unhealthy.
+    Opens after `failure_threshold` consecutive failures, lets a single probe through
+    after `reset_timeout` seconds and closes again once the probe succeeds.
+    """
+
+    __slots__ = ("host", "failure_threshold", "reset_timeout", "failures", "_state", "_opened_at", "_probing")
+
+    def __init__(self, host: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+            return CircuitState.HALF_OPEN
+        return self._state
+
+    def check(self) -> bool:
+        """
+        raise `CircuitOpenError` if the request is not allowed to go upstream,
+        otherwise tell whether it is the probe of a half-open circuit
+        """
+        match self.state:
+            case CircuitState.CLOSED:
+                return False
+            case CircuitState.HALF_OPEN if not self._probing:
+                self._probing = True
+                return True
+            case _:
+                raise CircuitOpenError(f"circuit for {self.host} is open after {self.failures} failures")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._state = CircuitState.CLOSED
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._state = CircuitState.OPEN
+            self._opened_at = monotonic()
+        self._probing = False
+
+    def release(self, probe: bool) -> None:
+        """
+        the request ended without an outcome (e.g. it was cancelled), if it was the probe the next one may probe again.
+        Requests let through before the circuit opened must not free the probe of another one
+        """
+        if probe:
+            self._probing = False
+
+
+circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    if (breaker := circuit_breakers.get(host)) is None:
+        breaker = circuit_breakers[host] = CircuitBreaker(
+            host,
+            failure_threshold=settings.HTTP_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.HTTP_CIRCUIT_RESET_TIMEOUT,
+        )
+    return breaker
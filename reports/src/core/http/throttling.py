@@ -0,0 +1,67 @@
+from asyncio import Lock, Semaphore, sleep
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from math import ceil
+from time import monotonic
+
+from src.config import settings
+
+__all__ = ("HostThrottle", "TokenBucket", "throttle")
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `capacity` stored.
+    Waiters are served in FIFO order.
+    """
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated_at", "_lock")
+
+    def __init__(self, rate: float, capacity: int | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1, ceil(rate))
+        self._tokens = float(self.capacity)
+        self._updated_at = monotonic()
+        self._lock = Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await sleep((1 - self._tokens) / self.rate)
+
+
+class HostThrottle:
+    """Rate limit plus max-in-flight requests for a single upstream host"""
+
+    __slots__ = ("bucket", "semaphore")
+
+    def __init__(self, rate: float | None, max_in_flight: int) -> None:
+        self.bucket = TokenBucket(rate) if rate else None
+        self.semaphore = Semaphore(max_in_flight)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None, None]:
+        async with self.semaphore:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            yield
+
+
+_throttles: dict[str, HostThrottle] = {}
+
+
+def throttle(host: str) -> HostThrottle:
+    """get (or lazily create) the throttle of the upstream host, configured in `Settings`"""
+    if (host_throttle := _throttles.get(host)) is None:
+        host_throttle = _throttles[host] = HostThrottle(
+            rate=settings.HTTP_RATE_LIMITS.get(host),
+            max_in_flight=settings.HTTP_MAX_IN_FLIGHT.get(host, settings.HTTP_DEFAULT_MAX_IN_FLIGHT),
+        )
+    return host_throttle
@@ -0,0 +1,205 @@
+"""
+Jetton wallet addresses of (owner, jetton master) pairs.
+An address never changes once derived, so resolved ones are kept in a local sqlite store
+and only the missing ones are computed or asked from the liteservers, concurrently and with bounded retries.
+
+A standard (TEP-74) jetton wallet address is the hash of its StateInit: the wallet code of the master
+and data made of a zero balance, the owner, the master and the wallet code again.
+The wallet code of a master is fetched with `get_jetton_data` once and checked against one `get_wallet_address`
+answer, masters whose wallets are laid out differently keep being asked with `get_wallet_address`.
+"""
+
+import sqlite3
+from collections.abc import Iterable
+from functools import partial
+from typing import Any, cast
+
+from loguru import logger
+from pytoniq import (
+    Address,
+    Cell,
+    LiteClientLike,
+    RunGetMethodError,
+    StateInit,
+    begin_cell,
+)
+
+from src.config import settings
+from src.core.concurrency import gather_limited
+from src.core.lite import lite_client, retry_lite_query
+from src.core.sqlite import connect
+
+__all__ = (
+    "JettonWalletCache",
+    "derive_jetton_wallet",
+    "jetton_wallet_cache",
+    "resolve_jetton_wallets",
+    "to_raw_address",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jetton_wallets (
+    owner TEXT NOT NULL,
+    master TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    PRIMARY KEY (owner, master)
+);
+CREATE TABLE IF NOT EXISTS jetton_masters (
+    master TEXT NOT NULL PRIMARY KEY,
+    wallet_code BLOB
+);
+"""
+
+
+def to_raw_address(address: Address | str) -> str:
+    """`workchain:hex` form of an address"""
+    return cast(str, (address if isinstance(address, Address) else Address(address)).to_str(is_user_friendly=False))
+
+
+def derive_jetton_wallet(owner: str, master: str, wallet_code: Cell) -> str:
+    """raw address of the standard jetton wallet of `owner`"""
+    master_address = Address(master)
+    data = (
+        begin_cell()
+        .store_coins(0)
+        .store_address(Address(owner))
+        .store_address(master_address)
+        .store_ref(wallet_code)
+        .end_cell()
+    )
+    state_init = StateInit(code=wallet_code, data=data).serialize()
+    return f"{master_address.wc}:{state_init.hash.hex()}"
+
+
+class JettonWalletCache:
+    __slots__ = ("_connection",)
+
+    def __init__(self) -> None:
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect(settings.JETTON_WALLETS_CACHE_PATH, _SCHEMA)
+        return self._connection
+
+    def get_many(self, owner: str, masters: Iterable[str]) -> dict[str, str]:
+        """cached jetton wallets of `owner` by jetton master, all addresses are raw"""
+        masters = list(masters)
+        rows = self.connection.execute(
+            f"SELECT master, wallet FROM jetton_wallets WHERE owner = ? AND master IN ({_placeholders(masters)})",
+            (owner, *masters),
+        )
+        return dict(rows.fetchall())
+
+    def set_many(self, owner: str, wallets: dict[str, str]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO jetton_wallets VALUES (?, ?, ?)",
+            [(owner, master, wallet) for master, wallet in wallets.items()],
+        )
+
+    def get_wallet_codes(self, masters: Iterable[str]) -> dict[str, Cell | None]:
+        """known wallet codes by master, `None` for non-standard masters, unknown masters are missing"""
+        masters = list(masters)
+        rows = self.connection.execute(
+            f"SELECT master, wallet_code FROM jetton_masters WHERE master IN ({_placeholders(masters)})", masters
+        )
+        return {master: Cell.one_from_boc(code) if code is not None else None for master, code in rows.fetchall()}
+
+    def set_wallet_codes(self, codes: dict[str, Cell | None]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO jetton_masters VALUES (?, ?)",
+            [(master, code.to_boc() if code is not None else None) for master, code in codes.items()],
+        )
+
+
+def _placeholders(values: list[str]) -> str:
+    return ", ".join("?" * len(values))
+
+
+jetton_wallet_cache = JettonWalletCache()
+
+
+async def resolve_jetton_wallets(owner: Address | str, masters: Iterable[Address | str]) -> dict[str, str]:
+    """raw jetton wallet addresses of `owner` by raw jetton master address"""
+    owner = to_raw_address(owner)
+    masters = [to_raw_address(master) for master in masters]
+    if not _is_cache_enabled():
+        async with lite_client() as provider:
+            resolved = await gather_limited(
+                (_get_wallet_address(provider, owner, master) for master in masters), limit=settings.LITE_CONCURRENCY
+            )
+        return dict(zip(masters, resolved, strict=True))
+
+    wallets = jetton_wallet_cache.get_many(owner, masters)
+    if not (missing := [master for master in masters if master not in wallets]):
+        return wallets
+
+    new_wallets = await _derive_jetton_wallets(owner, missing)
+    if remaining := [master for master in missing if master not in new_wallets]:
+        async with lite_client() as provider:
+            resolved = await gather_limited(
+                (_get_wallet_address(provider, owner, master) for master in remaining),
+                limit=settings.LITE_CONCURRENCY,
+            )
+        new_wallets |= dict(zip(remaining, resolved, strict=True))
+
+    jetton_wallet_cache.set_many(owner, new_wallets)
+    return wallets | new_wallets
+
+
+def _is_cache_enabled() -> bool:
+    """
+    wallets are not cached (nor derived offline) while upstream fixtures are recorded or replayed,
+    a recording made with a warm cache would miss the liteserver answers a replay from an empty one asks for
+    """
+    return settings.JETTON_WALLETS_CACHE_ENABLED and settings.UPSTREAM_FIXTURES_MODE == "off"
+
+
+async def _derive_jetton_wallets(owner: str, masters: list[str]) -> dict[str, str]:
+    """
+    jetton wallets of the standard masters computed locally,
+    the first time a master is seen its wallet code is learned while resolving `owner` on the liteserver
+    """
+    codes = jetton_wallet_cache.get_wallet_codes(masters)
+    wallets: dict[str, str] = {}
+    if unknown := [master for master in masters if master not in codes]:
+        async with lite_client() as provider:
+            learned = await gather_limited(
+                (_learn_wallet_code(provider, owner, master) for master in unknown), limit=settings.LITE_CONCURRENCY
+            )
+        for master, (code, wallet) in zip(unknown, learned, strict=True):
+            codes[master] = code
+            wallets[master] = wallet
+        jetton_wallet_cache.set_wallet_codes({master: codes[master] for master in unknown})
+
+    for master in masters:
+        if master not in wallets and (code := codes[master]) is not None:
+            wallets[master] = derive_jetton_wallet(owner, master, code)
+    return wallets
+
+
+async def _learn_wallet_code(provider: LiteClientLike, owner: str, master: str) -> tuple[Cell | None, str]:
+    """wallet code of the master if it derives the wallet of `owner` right, and that wallet"""
+    wallet = await _get_wallet_address(provider, owner, master)
+    try:
+        code = (await _run_get_method(provider, master, "get_jetton_data", []))[4]
+    except (RunGetMethodError, IndexError) as e:
+        logger.warning(f"failed to get wallet code of jetton {master}, its wallets will be resolved online: {e!r}")
+        return None, wallet
+
+    if not isinstance(code, Cell) or derive_jetton_wallet(owner, master, code) != wallet:
+        logger.info(f"jetton {master} is not a standard one, its wallets will be resolved online")
+        return None, wallet
+    return code, wallet
+
+
+async def _get_wallet_address(provider: LiteClientLike, owner: str, master: str) -> str:
+    stack = [begin_cell().store_address(Address(owner)).end_cell().begin_parse()]
+    result = await _run_get_method(provider, master, "get_wallet_address", stack)
+    return to_raw_address(result[0].load_address())
+
+
+async def _run_get_method(provider: LiteClientLike, address: str, method: str, stack: list[Any]) -> list[Any]:
+    query = partial(provider.run_get_method, address=address, method=method, stack=stack)
+    return cast(list[Any], await retry_lite_query(query, f"{method} of {address}"))
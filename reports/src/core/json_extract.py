@@ -0,0 +1,52 @@
+"""
+Extraction of one subtree of a large JSON document.
+
+`json.loads` keeps the whole document as Python objects until the wanted member is read out of it.
+`extract_json` walks down the objects of a path instead and decodes their members one at a time,
+the ones off the path are dropped right away, so the peak memory is the largest member rather than the document.
+"""
+
+import json
+import re
+from typing import Any, cast
+
+__all__ = ("extract_json",)
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def extract_json(text: str, *path: str) -> Any:
+    """the value at `path` (object member names) of the JSON document `text`, `KeyError` if one is missing"""
+    pos = _skip_whitespace(text, 0)
+    for key in path:
+        pos = _find_member(text, pos, key)
+    value, _ = _DECODER.raw_decode(text, pos)
+    return value
+
+
+def _find_member(text: str, pos: int, key: str) -> int:
+    """position of the value of member `key` of the object at `pos`"""
+    if text[pos : pos + 1] != "{":
+        raise json.JSONDecodeError("Expecting object", text, pos)
+
+    pos = _skip_whitespace(text, pos + 1)
+    while text[pos : pos + 1] == '"':
+        name, pos = _DECODER.raw_decode(text, pos)
+        pos = _skip_whitespace(text, pos)
+        if text[pos : pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        pos = _skip_whitespace(text, pos + 1)
+        if name == key:
+            return pos
+        # decoded and dropped, the C decoder finds its end faster than any scan written in Python
+        _, pos = _DECODER.raw_decode(text, pos)
+        pos = _skip_whitespace(text, pos)
+        if text[pos : pos + 1] == ",":
+            pos = _skip_whitespace(text, pos + 1)
+    raise KeyError(key)
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    # never fails, whitespace may be empty
+    return cast(re.Match[str], _WHITESPACE.match(text, pos)).end()
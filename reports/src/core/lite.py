@@ -0,0 +1,301 @@
+import asyncio
+import json
+from base64 import b64decode, b64encode
+from collections.abc import AsyncGenerator, Awaitable, Callable, Generator
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from functools import partial
+from hashlib import sha256
+from time import perf_counter
+from typing import Any, cast
+
+from loguru import logger
+from pytoniq import (
+    Account,
+    Address,
+    BalancerError,
+    BlockIdExt,
+    Cell,
+    LiteBalancer,
+    LiteClientError,
+    LiteClientLike,
+    LiteServerError,
+    RunGetMethodError,
+    ShardAccount,
+    Slice,
+    VmStack,
+)
+
+from src.config import settings
+from src.core.block_index import BlockSample, find_block, is_indexable
+from src.core.fixtures import is_recording, is_replaying, load_fixture, save_fixture
+from src.core.http.retry import backoff_delay
+from src.core.metrics import LITESERVER_LATENCY
+
+__all__ = (
+    "SharedLiteBalancer",
+    "get_config",
+    "get_masterchain_block",
+    "lite_balancer",
+    "lite_client",
+    "retry_lite_query",
+)
+
+_FIXTURES_KIND = "lite"
+
+
+def get_config() -> dict[str, Any]:
+    with settings.TON_CONFIG.open() as file:
+        config = json.load(file)
+
+    return cast(dict[str, Any], config)
+
+
+class SharedLiteBalancer:
+    """
+    One `LiteBalancer` for the app lifetime, connected at startup or on first use.
+    The balancer reconnects single liteservers by itself, the health check replaces it as a whole
+    when the liteservers do not answer at all
+    """
+
+    __slots__ = ("_balancer", "_lock", "_health_check")
+
+    def __init__(self) -> None:
+        self._balancer: LiteBalancer | None = None
+        self._lock = asyncio.Lock()
+        self._health_check: asyncio.Task[None] | None = None
+
+    @property
+    def alive_peers(self) -> int:
+        return cast(int, self._balancer.alive_peers_num) if self._balancer is not None else 0
+
+    async def get(self) -> LiteBalancer:
+        if (balancer := self._balancer) is not None:
+            return balancer
+
+        async with self._lock:
+            if self._balancer is None:
+                self._balancer = await self._connect()
+            if self._health_check is None or self._health_check.done():
+                self._health_check = asyncio.create_task(self._check_health())
+            return self._balancer
+
+    async def reconnect(self) -> None:
+        async with self._lock:
+            balancer, self._balancer = self._balancer, None
+            if balancer is not None:
+                await _close(balancer)
+            self._balancer = await self._connect()
+
+    async def aclose(self) -> None:
+        if self._health_check is not None:
+            self._health_check.cancel()
+            self._health_check = None
+        async with self._lock:
+            balancer, self._balancer = self._balancer, None
+        if balancer is not None:
+            await _close(balancer)
+
+    @staticmethod
+    async def _connect() -> LiteBalancer:
+        balancer = LiteBalancer.from_config(get_config(), trust_level=2)
+        await balancer.start_up()
+        logger.info(f"connected to {balancer.alive_peers_num} liteservers")
+        return balancer
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LITE_HEALTH_CHECK_INTERVAL)
+            try:
+                balancer = await self.get()
+                async with asyncio.timeout(settings.LITE_HEALTH_CHECK_TIMEOUT):
+                    await balancer.get_masterchain_info()
+            except (BalancerError, LiteServerError, LiteClientError, TimeoutError) as e:
+                logger.warning(f"liteservers health check failed: {e!r}, reconnecting")
+                try:
+                    await self.reconnect()
+                except (BalancerError, LiteServerError, LiteClientError, TimeoutError) as reconnect_error:
+                    logger.error(f"failed to reconnect to liteservers: {reconnect_error!r}")
+
+
+async def _close(balancer: LiteBalancer) -> None:
+    try:
+        await balancer.close_all()
+    except (BalancerError, LiteServerError, LiteClientError) as e:
+        logger.warning(f"failed to close liteserver connections: {e!r}")
+
+
+lite_balancer = SharedLiteBalancer()
+
+
+@asynccontextmanager
+async def lite_client() -> AsyncGenerator[LiteClientLike, None]:
+    """
+    liteserver client, recording or replaying its answers according to `UPSTREAM_FIXTURES_MODE`,
+    real queries go through the shared `lite_balancer` and are measured on `/metrics`
+    """
+    if is_replaying():
+        yield ReplayLiteClient()
+        return
+
+    yield InstrumentedLiteClient(await lite_balancer.get(), record=is_recording())
+
+
+async def retry_lite_query[_T](query: Callable[[], Awaitable[_T]], description: str) -> _T:
+    """
+    `query` retried on liteserver errors according to `LITE_RETRY_POLICY`, the last error is raised.
+    A get method that fails (non-zero exit code) fails the same way every time and is raised right away
+    """
+    policy = settings.LITE_RETRY_POLICY
+    for attempt in range(1, policy.max_attempts):
+        try:
+            return await query()
+        except RunGetMethodError:
+            raise
+        except (BalancerError, LiteServerError, LiteClientError, TimeoutError) as e:
+            logger.warning(f"lite server doesnt respond to {description}: {e!r}")
+            await asyncio.sleep(backoff_delay(policy, attempt))
+
+    return await query()
+
+
+async def get_masterchain_block(client: LiteClientLike, date_: datetime) -> BlockIdExt:
+    """
+    masterchain block at `date_`, old blocks are only kept by archive liteservers.
+    Blocks of settled dates are kept in the local block index
+    """
+    if not is_indexable(date_):
+        return await _lookup_masterchain_block(client, int(date_.timestamp()))
+
+    sample = await find_block("ton", int(date_.timestamp()), partial(_lookup_masterchain_sample, client))
+    return BlockIdExt.from_dict(sample["data"])
+
+
+async def _lookup_masterchain_sample(client: LiteClientLike, utime: int) -> BlockSample:
+    block = await _lookup_masterchain_block(client, utime)
+    return {"timestamp": utime, "block": block.seqno, "data": block.to_dict()}
+
+
+async def _lookup_masterchain_block(client: LiteClientLike, utime: int) -> BlockIdExt:
+    query = partial(client.lookup_block, wc=-1, shard=-(2**63), utime=utime, only_archive=True)
+    block, _ = await retry_lite_query(query, f"lookup_block at {utime}")
+    return cast(BlockIdExt, block)
+
+
+@contextmanager
+def _measure(operation: str) -> Generator[None, None, None]:
+    started_at = perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception as e:
+        status = type(e).__name__
+        raise
+    finally:
+        LITESERVER_LATENCY.observe(operation, status, value=perf_counter() - started_at)
+
+
+class InstrumentedLiteClient:
+    """proxies a real liteserver client, measures every query and optionally stores its answer as a fixture"""
+
+    __slots__ = ("_client", "_record")
+
+    def __init__(self, client: LiteClientLike, record: bool = False) -> None:
+        self._client = client
+        self._record = record
+
+    async def run_get_method(
+        self, address: Address | str, method: str, stack: list[Any], block: BlockIdExt | None = None
+    ) -> list[Any]:
+        with _measure(f"run_get_method.{method}"):
+            result = await self._client.run_get_method(address=address, method=method, stack=stack, block=block)
+        if self._record:
+            key = _get_method_key(address, method, stack, block)
+            save_fixture(_FIXTURES_KIND, key, {"stack": _encode_stack(result)})
+        return cast(list[Any], result)
+
+    async def lookup_block(
+        self, wc: int, shard: int, seqno: int = -1, lt: int | None = None, utime: int | None = None, **kwargs: Any
+    ) -> tuple[BlockIdExt, Any]:
+        with _measure("lookup_block"):
+            block, header = await self._client.lookup_block(
+                wc=wc, shard=shard, seqno=seqno, lt=lt, utime=utime, **kwargs
+            )
+        if self._record:
+            save_fixture(_FIXTURES_KIND, _lookup_block_key(wc, shard, seqno, lt, utime), {"block": block.to_dict()})
+        return block, header
+
+    async def raw_get_account_state(
+        self, address: Address | str, block: BlockIdExt | None = None
+    ) -> tuple[Account | None, ShardAccount | None]:
+        with _measure("raw_get_account_state"):
+            account, shard_account = await self._client.raw_get_account_state(address=address, block=block)
+        if self._record:
+            state = b64encode(shard_account.cell.to_boc()).decode() if shard_account is not None else None
+            save_fixture(_FIXTURES_KIND, _account_state_key(address, block), {"shard_account": state})
+        return account, shard_account
+
+
+class ReplayLiteClient:
+    """
+    serves recorded liteserver answers without any network,
+    block headers are not recorded, so `lookup_block` returns `None` instead of the header
+    """
+
+    __slots__ = ()
+
+    async def run_get_method(
+        self, address: Address | str, method: str, stack: list[Any], block: BlockIdExt | None = None
+    ) -> list[Any]:
+        fixture = await load_fixture(_FIXTURES_KIND, _get_method_key(address, method, stack, block))
+        return _decode_stack(fixture["stack"])
+
+    async def lookup_block(
+        self, wc: int, shard: int, seqno: int = -1, lt: int | None = None, utime: int | None = None, **kwargs: Any
+    ) -> tuple[BlockIdExt, None]:
+        _ = kwargs
+        fixture = await load_fixture(_FIXTURES_KIND, _lookup_block_key(wc, shard, seqno, lt, utime))
+        return BlockIdExt.from_dict(fixture["block"]), None
+
+    async def raw_get_account_state(
+        self, address: Address | str, block: BlockIdExt | None = None
+    ) -> tuple[Account | None, ShardAccount | None]:
+        fixture = await load_fixture(_FIXTURES_KIND, _account_state_key(address, block))
+        if (state := fixture["shard_account"]) is None:
+            return None, None
+        shard_account = ShardAccount.deserialize(Cell.one_from_boc(b64decode(state)).begin_parse())
+        return shard_account.account, shard_account
+
+
+def _key(*parts: Any) -> str:
+    return sha256(json.dumps(parts, separators=(",", ":")).encode()).hexdigest()
+
+
+def _get_method_key(address: Address | str, method: str, stack: list[Any], block: BlockIdExt | None) -> str:
+    return _key(
+        "run_get_method",
+        _raw_address(address),
+        method,
+        _encode_stack(stack),
+        block.to_dict() if block is not None else None,
+    )
+
+
+def _account_state_key(address: Address | str, block: BlockIdExt | None) -> str:
+    return _key("raw_get_account_state", _raw_address(address), block.to_dict() if block is not None else None)
+
+
+def _raw_address(address: Address | str) -> str:
+    return cast(str, (address if isinstance(address, Address) else Address(address)).to_str(is_user_friendly=False))
+
+
+def _lookup_block_key(wc: int, shard: int, seqno: int, lt: int | None, utime: int | None) -> str:
+    return _key("lookup_block", wc, shard, seqno, lt, utime)
+
+
+def _encode_stack(stack: list[Any]) -> str:
+    return b64encode(VmStack.serialize(stack).to_boc()).decode()
+
+
+def _decode_stack(stack: str) -> list[Any]:
+    return cast(list[Any], VmStack.deserialize(Slice.one_from_boc(b64decode(stack))))
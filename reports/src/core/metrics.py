@@ -0,0 +1,152 @@
+"""
+Minimal in-process metrics rendered in Prometheus text exposition format, see `/metrics`.
+Label values are passed positionally in the order of `labelnames`.
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from math import inf
+from typing import ClassVar
+
+__all__ = (
+    "LITESERVER_LATENCY",
+    "SINGLEFLIGHT_CALLS",
+    "SINGLEFLIGHT_COALESCED",
+    "UPSTREAM_BYTES",
+    "UPSTREAM_CACHE_HITS",
+    "UPSTREAM_CIRCUIT_OPEN",
+    "UPSTREAM_LATENCY",
+    "UPSTREAM_RETRIES",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "render_metrics",
+)
+
+type _Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: tuple[str, ...], values: _Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    type_: ClassVar[str]
+    registry: ClassVar[list["_Metric"]] = []
+
+    __slots__ = ("name", "documentation", "labelnames")
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.registry.append(self)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_}", *self._samples()]
+
+    @abstractmethod
+    def _samples(self) -> list[str]: ...
+
+
+class Counter(_Metric):
+    type_ = "counter"
+
+    __slots__ = ("_values",)
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: defaultdict[_Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] += amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    type_ = "gauge"
+
+    __slots__ = ()
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type_ = "histogram"
+
+    __slots__ = ("buckets", "_counts", "_sums")
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), inf)
+        self._counts: dict[_Labels, list[int]] = {}
+        self._sums: defaultdict[_Labels, float] = defaultdict(float)
+
+    def observe(self, *labels: str, value: float) -> None:
+        if (counts := self._counts.get(labels)) is None:
+            counts = self._counts[labels] = [0] * len(self.buckets)
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def _samples(self) -> list[str]:
+        samples: list[str] = []
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=True):
+                cumulative += count
+                le = "+Inf" if bound == inf else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                samples.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {self._sums[labels]}")
+            samples.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return samples
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _Metric.registry for line in metric.render()) + "\n"
+
+
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Duration of a single HTTP attempt to an upstream",
+    ("host", "operation", "status"),
+    _LATENCY_BUCKETS,
+)
+UPSTREAM_BYTES = Histogram(
+    "upstream_response_bytes",
+    "Size of upstream HTTP response bodies",
+    ("host", "operation"),
+    (1e3, 1e4, 1e5, 1e6, 1e7, 1e8),
+)
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "Retried upstream HTTP attempts", ("host", "operation"))
+UPSTREAM_CACHE_HITS = Counter(
+    "upstream_cache_hits_total", "Upstream HTTP requests served from the on-disk cache", ("host", "operation")
+)
+UPSTREAM_CIRCUIT_OPEN = Gauge(
+    "upstream_circuit_open", "1 while the circuit breaker of the upstream host is not closed", ("host",)
+)
+LITESERVER_LATENCY = Histogram(
+    "liteserver_request_duration_seconds",
+    "Duration of liteserver queries",
+    ("operation", "status"),
+    _LATENCY_BUCKETS,
+)
+SINGLEFLIGHT_CALLS = Gauge("singleflight_calls", "Calls that went through a singleflight group", ("group",))
+SINGLEFLIGHT_COALESCED = Gauge(
+    "singleflight_coalesced", "Calls that awaited an identical in-flight call instead of repeating it", ("group",)
+)
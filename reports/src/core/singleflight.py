@@ -0,0 +1,47 @@
+from asyncio import Future, ensure_future, shield
+from collections.abc import Awaitable, Callable, Coroutine, Hashable
+from functools import wraps
+from typing import Any, cast
+
+__all__ = ("SingleFlight", "singleflight", "singleflight_groups")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the work,
+    the others await its result instead of repeating it.
+    """
+
+    __slots__ = ("name", "calls", "coalesced", "_in_flight")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: dict[Hashable, Future[Any]] = {}
+
+    async def do[_T](self, key: Hashable, fn: Callable[[], Awaitable[_T]]) -> _T:
+        self.calls += 1
+        if (future := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            future = self._in_flight[key] = ensure_future(fn())
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # one cancelled caller must not cancel the call shared with the others
+        return cast(_T, await shield(future))
+
+
+singleflight_groups: dict[str, SingleFlight] = {}
+
+
+def singleflight[**_P, _T](fn: Callable[_P, Coroutine[Any, Any, _T]]) -> Callable[_P, Coroutine[Any, Any, _T]]:
+    """coalesce concurrent calls of the coroutine function with equal (hashable) arguments"""
+    group = singleflight_groups[fn.__qualname__] = SingleFlight(fn.__qualname__)
+
+    @wraps(fn)
+    async def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        key = (args, tuple(sorted(kwargs.items())))
+        return await group.do(key, lambda: fn(*args, **kwargs))
+
+    return wrapper
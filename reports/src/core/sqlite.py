@@ -0,0 +1,15 @@
+import sqlite3
+from pathlib import Path
+
+__all__ = ("connect",)
+
+
+def connect(path: Path, schema: str = "") -> sqlite3.Connection:
+    """open (and create if needed) a local sqlite store in autocommit WAL mode"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        connection.executescript(schema)
+    return connection
@@ -1,30 +1,28 @@
-import json
 import re
+from asyncio import CancelledError
 from calendar import monthrange
 from datetime import UTC, datetime, timedelta
-from typing import Annotated, Any, cast
+from typing import Annotated
 
 import pandas as pd
 from dateutil.utils import today
+from fastapi import Response
 from loguru import logger
 from pydantic import Field
-from pytoniq import Address, LiteBalancer, begin_cell
+from pytoniq import Address
 
 from src.config import settings
 from src.core.const import Network
 from src.core.dto import JettonAddressBook, JettonWallet, Wallet
+from src.core.jetton_wallets import resolve_jetton_wallets, to_raw_address
+
+# stop the whole report instead of failing one wallet, project errors derive from `BaseException` but are not fatal
+_FATAL_ERRORS = (CancelledError, KeyboardInterrupt, SystemExit)
 
 ETH_PATTERN = re.compile(r"^0x[a-fA-F0-9]{40}$")
 TON_PATTERN = re.compile(r"^(EQ|Ef|kQ)[0-9A-Za-z_-]{43}$")
 
 
-def get_config() -> dict[str, Any]:
-    with settings.TON_CONFIG.open() as file:
-        config = json.load(file)
-
-    return cast(dict[str, Any], config)
-
-
 def get_last_days_of_months_from_now(number_of_months: int) -> list[datetime]:
     today_datetime = today(UTC)
     last_days = []
@@ -67,34 +65,49 @@ def get_start_and_end_dates_for_request(
 
 
 async def get_jetton_wallets(wallet: Wallet, jettons: JettonAddressBook) -> list[JettonWallet]:
-    config = get_config()
-    jetton_wallets: list[JettonWallet] = []
-    async with LiteBalancer.from_config(config, trust_level=2) as provider:
-        try:
-            user_address = Address(wallet.address)
-        except Exception:
-            logger.error(f"Failed to parse address {wallet.address}")
-            raise
-
-        for jetton in jettons.root:
-            address = (
-                await provider.run_get_method(
-                    address=jetton.address,
-                    method="get_wallet_address",
-                    stack=[begin_cell().store_address(user_address).end_cell().begin_parse()],
-                )
-            )[0].load_address()
-            raw_address = f"{address.to_tl_account_id()["workchain"]}:{address.to_tl_account_id()["id"]}"
-            jetton_wallets.append(
-                JettonWallet(
-                    address=raw_address,
-                    account_name=wallet.account_name,
-                    jetton_master=jetton.address,
-                    symbol=jetton.symbol,
-                )
-            )
-
-    return jetton_wallets
+    try:
+        user_address = Address(wallet.address)
+    except Exception:
+        logger.error(f"Failed to parse address {wallet.address}")
+        raise
+
+    addresses = await resolve_jetton_wallets(user_address, (jetton.address for jetton in jettons.root))
+    return [
+        JettonWallet(
+            address=addresses[to_raw_address(jetton.address)],
+            account_name=wallet.account_name,
+            jetton_master=jetton.address,
+            symbol=jetton.symbol,
+        )
+        for jetton in jettons.root
+    ]
+
+
+def collect_wallet_reports(
+    wallets: list[Wallet], results: list[pd.DataFrame | BaseException], response: Response
+) -> list[pd.DataFrame]:
+    """
+    reports of the wallets that succeeded, in the order of `wallets`.
+    Failures are logged and listed in the `X-Failed-Wallets` header, if every wallet failed the first error is raised
+    """
+    reports: list[pd.DataFrame] = []
+    errors: list[BaseException] = []
+    failed: list[str] = []
+    for wallet, result in zip(wallets, results, strict=True):
+        if isinstance(result, _FATAL_ERRORS):
+            raise result
+        if isinstance(result, BaseException):
+            logger.opt(exception=result).error(f"Failed to build the report of {wallet.account_name} {wallet.address}")
+            errors.append(result)
+            failed.append(wallet.address)
+        else:
+            reports.append(result)
+
+    if errors and not reports:
+        raise errors[0]
+    if failed:
+        response.headers["X-Failed-Wallets"] = ",".join(failed)
+    return reports
 
 
 def create_media_if_not_exists() -> None:
@@ -1,15 +1,26 @@
+from asyncio import create_task
 from datetime import UTC
 
 import pandas as pd
 from dateutil.utils import today
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 from loguru import logger
 
+from src.config import settings
+from src.core.concurrency import gather_limited_settled
 from src.core.const import Network
-from src.core.dto import JettonAddressBook, Wallets
-from src.core.utils import get_start_and_end_dates_for_request, get_wallet_network
+from src.core.dto import JettonAddressBook, Wallet, Wallets
+from src.core.utils import (
+    collect_wallet_reports,
+    get_start_and_end_dates_for_request,
+    get_wallet_network,
+)
 from src.modules.balances.dto import BalancesReport
-from src.modules.balances.services.eth import get_eth_wallet_balance
+from src.modules.balances.services.eth import (
+    get_eth_wallet_balance,
+    get_eth_wallets_balances,
+    is_batched,
+)
 from src.modules.balances.services.jettons import get_jetton_balance
 from src.modules.balances.services.ton import get_ton_balance
 
@@ -19,6 +30,7 @@ router = APIRouter(prefix="/balances", tags=["reports"])
 @router.post("/")
 async def generate_balances_report(
     *,
+    response: Response,
     wallets: Wallets,
     jettons: JettonAddressBook,
     month: int = Query(ge=1, le=12),
@@ -38,32 +50,31 @@ async def generate_balances_report(
     if month != now.month or year != now.year:
         balance_target_date = end_date
 
-    balances_dfs: list[pd.DataFrame] = []
+    eth_wallets = [wallet for wallet in wallets.root if get_wallet_network(wallet) is Network.ETH]
+    # with JSON-RPC the balances of all the ETH wallets are read at once, Etherscan is asked wallet by wallet
+    eth_balances = None
+    if eth_wallets and is_batched(balance_target_date):
+        eth_balances = create_task(get_eth_wallets_balances(eth_wallets, balance_target_date))
 
-    for wallet in wallets.root:
+    async def get_wallet_balances(wallet: Wallet) -> pd.DataFrame:
         if get_wallet_network(wallet) is Network.ETH:
-            print(1111111111111111111111111111111111111111111111111111111)
-            balances_report = await get_eth_wallet_balance(wallet, balance_target_date)
-            if not balances_report.empty:
-                balances_report["date"] = pd.to_datetime(balances_report["date"], errors="coerce").dt.tz_localize(None)
-                balances_report["date"] = balances_report["date"].dt.tz_localize("UTC").dt.normalize()
-        else:
-            print(2222222222222222222222222222222222222222222222222222222222)
-            balances_ton_report = await get_ton_balance(wallet, balance_target_date)
-            print(33333333333333333333333333333333333333333333333333333333333)
-            balances_jetton_report = await get_jetton_balance(wallet, jettons, balance_target_date)
-            if not balances_ton_report.empty:
-                balances_ton_report["date"] = pd.to_datetime(
-                    balances_ton_report["date"], errors="coerce"
-                ).dt.tz_localize(None)
-                balances_ton_report["date"] = balances_ton_report["date"].dt.tz_localize("UTC").dt.normalize()
-            if not balances_jetton_report.empty:
-                balances_jetton_report["date"] = pd.to_datetime(
-                    balances_jetton_report["date"], errors="coerce"
-                ).dt.tz_localize(None)
-                balances_jetton_report["date"] = balances_jetton_report["date"].dt.tz_localize("UTC").dt.normalize()
-            balances_report = pd.concat([balances_ton_report, balances_jetton_report])
+            if eth_balances is None:
+                return _normalize_dates(await get_eth_wallet_balance(wallet, balance_target_date))
+            return _normalize_dates((await eth_balances)[wallet])
 
-        balances_dfs.append(balances_report)
+        balances_ton_report = await get_ton_balance(wallet, balance_target_date)
+        balances_jetton_report = await get_jetton_balance(wallet, jettons, balance_target_date)
+        return pd.concat([_normalize_dates(balances_ton_report), _normalize_dates(balances_jetton_report)])
 
+    results = await gather_limited_settled(
+        (get_wallet_balances(wallet) for wallet in wallets.root), limit=settings.REPORT_WALLETS_CONCURRENCY
+    )
+    balances_dfs = collect_wallet_reports(wallets.root, results, response)
     return BalancesReport.model_validate(pd.concat(balances_dfs).to_dict(orient="records"))
+
+
+def _normalize_dates(balances_report: pd.DataFrame) -> pd.DataFrame:
+    if not balances_report.empty:
+        balances_report["date"] = pd.to_datetime(balances_report["date"], errors="coerce").dt.tz_localize(None)
+        balances_report["date"] = balances_report["date"].dt.tz_localize("UTC").dt.normalize()
+    return balances_report
@@ -1,34 +1,69 @@
+from asyncio import gather
 from datetime import UTC, datetime
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 from httpx import QueryParams
 
 from src.config import settings
+from src.core.concurrency import gather_limited
 from src.core.dto import Wallet
+from src.core.eth_rpc import balance_of_call, get_balance_call, hex_to_int, rpc_batch
 from src.core.http import send_request
+from src.modules.balances.services.historical.erc20 import get_historical_erc20_balances
 from src.modules.balances.services.historical.eth import get_historical_eth_balance
 from src.modules.prices.services.coinmarketcap import get_mean_price_for_month_from_cmc
 from src.modules.prices.services.utils import convert_currency
+from src.modules.transfers.services.eth import get_block_by_timestamp
 
-__all__ = ("get_eth_wallet_balance",)
+__all__ = ("get_eth_wallet_balance", "get_eth_wallets_balances", "is_batched")
 
 TOKEN_LIST_ETH = pd.read_csv(settings.TOKEN_LIST_ETH_CSV)
 
 
+async def get_eth_wallets_balances(
+    wallets: list[Wallet], target_date: datetime | None = None
+) -> dict[Wallet, pd.DataFrame]:
+    """
+    balances of ETH wallets through the backend selected by `ETH_BALANCES_BACKEND`,
+    past balances are read from the archive node with `ETH_HISTORICAL_BALANCES="archive"`
+    """
+    if is_batched(target_date):
+        return await _get_rpc_wallets_balances(wallets, target_date)
+    balances = await gather_limited(
+        (_get_etherscan_wallet_balance(wallet, target_date) for wallet in wallets),
+        limit=settings.REPORT_WALLETS_CONCURRENCY,
+    )
+    return dict(zip(wallets, balances, strict=True))
+
+
+def is_batched(target_date: datetime | None = None) -> bool:
+    """whether balances of many wallets are read at once (JSON-RPC batches) or wallet by wallet (Etherscan)"""
+    return settings.ETH_BALANCES_BACKEND == "rpc" or bool(target_date and settings.ETH_HISTORICAL_BALANCES == "archive")
+
+
 async def get_eth_wallet_balance(wallet: Wallet, target_date: datetime | None = None) -> pd.DataFrame:
-    token_balances = []
-    for _, row in TOKEN_LIST_ETH.iterrows():
-        balance_token = await _get_erc20_token_balance(wallet, row["contractAddress"], row["decimal"])
-        balance_usd = await convert_currency(value=balance_token, from_=row["symbol"])
-        token_balances.append((row["symbol"], balance_token, balance_usd))
-
-    balance_df = pd.DataFrame(token_balances, columns=["symbol", "balance_token", "balance_usd"])
-    current_balance_eth = await _get_eth_balance(wallet)
+    return (await get_eth_wallets_balances([wallet], target_date))[wallet]
+
+
+async def _get_etherscan_wallet_balance(wallet: Wallet, target_date: datetime | None) -> pd.DataFrame:
+    if not target_date:
+        balance_df, balance_eth = await gather(_get_erc20_token_balances(wallet), _get_eth_balance(wallet))
+    else:
+        balance_df, balance_eth = await gather(
+            _get_historical_erc20_token_balances(wallet, target_date), _get_eth_balance(wallet)
+        )
+        balance_eth = await get_historical_eth_balance(wallet, balance_eth, target_date)
+    return await _build_wallet_balance(wallet, balance_df, balance_eth, target_date)
+
+
+async def _build_wallet_balance(
+    wallet: Wallet, balance_df: pd.DataFrame, balance_eth: float, target_date: datetime | None
+) -> pd.DataFrame:
     if not target_date:
-        balance_eth = current_balance_eth
         balance_usd = await convert_currency(value=balance_eth, from_="ETH")
     else:
-        balance_eth = await get_historical_eth_balance(wallet, current_balance_eth, target_date)
         balance_usd_price = await get_mean_price_for_month_from_cmc("ETH", target_date)
         balance_usd = balance_usd_price.price_end_usd * balance_eth if balance_usd_price else 0
 
@@ -41,6 +76,107 @@ async def get_eth_wallet_balance(wallet: Wallet, target_date: datetime | None =
     return balance[["date", "symbol", "balance_token", "balance_usd", "account_name"]]
 
 
+async def _get_rpc_wallets_balances(wallets: list[Wallet], target_date: datetime | None) -> dict[Wallet, pd.DataFrame]:
+    """
+    ETH and token balances of all wallets in a few batched JSON-RPC round trips,
+    tokens are priced once per symbol instead of once per wallet.
+    In archive mode past balances are read at the last block before `target_date`,
+    so the cost does not depend on the wallets' activity since then.
+    Without an archive node past balances are rebuilt from Etherscan for every wallet concurrently,
+    only the current ETH balances are read over JSON-RPC.
+    """
+    if not wallets:
+        return {}
+
+    archive = target_date is not None and settings.ETH_HISTORICAL_BALANCES == "archive"
+    if target_date and not archive:
+        results = await rpc_batch(
+            [get_balance_call(wallet.address) for wallet in wallets], operation="eth_rpc.balances"
+        )
+        balances = await gather_limited(
+            (
+                _get_historical_wallet_balance(wallet, hex_to_int(result) / 1e18, target_date)
+                for wallet, result in zip(wallets, results, strict=True)
+            ),
+            limit=settings.REPORT_WALLETS_CONCURRENCY,
+        )
+        return dict(zip(wallets, balances, strict=True))
+
+    block = await get_block_by_timestamp(target_date, "before") if target_date and archive else None
+    calls = [get_balance_call(wallet.address, block) for wallet in wallets]
+    calls += [
+        balance_of_call(contract_address, wallet.address, block)
+        for wallet in wallets
+        for contract_address in TOKEN_LIST_ETH["contractAddress"]
+    ]
+    results, token_prices = await gather(rpc_batch(calls, operation="eth_rpc.balances"), _get_token_prices())
+
+    raw_balances = np.array([hex_to_int(result) for result in results], dtype=float)
+    eth_balances = raw_balances[: len(wallets)] / 1e18
+    token_balances = raw_balances[len(wallets) :].reshape(len(wallets), len(TOKEN_LIST_ETH))
+    token_balances /= 10.0 ** TOKEN_LIST_ETH["decimal"].to_numpy()
+
+    wallets_balances: dict[Wallet, pd.DataFrame] = {}
+    for wallet, balances, balance_eth in zip(wallets, token_balances, eth_balances, strict=True):
+        balance_df = pd.DataFrame(
+            {"symbol": TOKEN_LIST_ETH["symbol"], "balance_token": balances, "balance_usd": balances * token_prices}
+        )
+        wallets_balances[wallet] = await _build_wallet_balance(wallet, balance_df, float(balance_eth), target_date)
+    return wallets_balances
+
+
+async def _get_historical_wallet_balance(wallet: Wallet, current_eth: float, target_date: datetime) -> pd.DataFrame:
+    balance_df, balance_eth = await gather(
+        _get_historical_erc20_token_balances(wallet, target_date),
+        get_historical_eth_balance(wallet, current_eth, target_date),
+    )
+    return await _build_wallet_balance(wallet, balance_df, balance_eth, target_date)
+
+
+async def _get_historical_erc20_token_balances(wallet: Wallet, target_date: datetime) -> pd.DataFrame:
+    balances, token_prices = await gather(
+        get_historical_erc20_balances(wallet, TOKEN_LIST_ETH, target_date), _get_token_prices()
+    )
+    return pd.DataFrame(
+        {"symbol": TOKEN_LIST_ETH["symbol"], "balance_token": balances, "balance_usd": balances * token_prices}
+    )
+
+
+async def _get_token_prices() -> npt.NDArray[np.float64]:
+    """USD price of one unit of every token from `TOKEN_LIST_ETH`"""
+    prices = await gather_limited(
+        (convert_currency(value=1, from_=symbol) for symbol in TOKEN_LIST_ETH["symbol"]),
+        limit=settings.ETH_TOKEN_BALANCES_CONCURRENCY,
+    )
+    return np.array(prices, dtype=float)
+
+
+async def _get_erc20_token_balances(wallet: Wallet) -> pd.DataFrame:
+    """balances of every token from `TOKEN_LIST_ETH`, fetched and priced concurrently"""
+    token_balances = await gather_limited(
+        (
+            _get_priced_erc20_token_balance(wallet, contract_address, decimal, symbol)
+            for contract_address, decimal, symbol in zip(
+                TOKEN_LIST_ETH["contractAddress"], TOKEN_LIST_ETH["decimal"], TOKEN_LIST_ETH["symbol"], strict=True
+            )
+        ),
+        limit=settings.ETH_TOKEN_BALANCES_CONCURRENCY,
+    )
+    balance_df = pd.DataFrame(token_balances, columns=["balance_token", "balance_usd"], index=TOKEN_LIST_ETH.index)
+    return balance_df.assign(symbol=TOKEN_LIST_ETH["symbol"])
+
+
+async def _get_priced_erc20_token_balance(
+    wallet: Wallet,
+    token_contract_address: str,
+    token_decimal: int,
+    token_symbol: str,
+) -> tuple[float, float]:
+    balance_token = await _get_erc20_token_balance(wallet, token_contract_address, token_decimal)
+    balance_usd = await convert_currency(value=balance_token, from_=token_symbol)
+    return balance_token, balance_usd
+
+
 async def _get_erc20_token_balance(
     wallet: Wallet,
     token_contract_address: str,
@@ -58,11 +194,13 @@ async def _get_erc20_token_balance(
         method="GET",
         url=settings.ETHERSCAN_API_BASE_URL,
         params=params,
+        operation="etherscan.tokenbalance",
     )
-    if response.json()["status"] != "1":
-        raise Exception(response.json()["message"])
+    data = response.json()
+    if data["status"] != "1":
+        raise Exception(data["message"])
 
-    balance = float(response.json()["result"])
+    balance = float(data["result"])
     return float(balance / (10**token_decimal))
 
 
@@ -78,5 +216,6 @@ async def _get_eth_balance(wallet: Wallet) -> float:
         method="GET",
         url=settings.ETHERSCAN_API_BASE_URL,
         params=params,
+        operation="etherscan.balance",
     )
     return float(response.json()["result"]) / 1e18
@@ -1,63 +1,50 @@
+"""
+ERC-20 balances at a past date from a single `tokentx` stream of the wallet:
+transfers of all tokens are signed from the wallet's point of view and summed up per contract,
+chunk by chunk, so the running balances are the only state kept while streaming
+"""
+
 from datetime import datetime
 
-from httpx import QueryParams
-from loguru import logger
+import pandas as pd
 
-from src.config import settings
 from src.core.dto import Wallet
-from src.core.http import send_request
+from src.core.http.cache import ttl_for_window
 from src.modules.transfers.dto import ETHTransfersList
 from src.modules.transfers.services.eth import get_block_by_timestamp
+from src.modules.transfers.services.etherscan import iter_etherscan_transactions
+
+__all__ = ("get_historical_erc20_balances",)
 
 
-async def get_historical_eth_balance(
-    wallet: Wallet,
-    current_balance: float,
-    target_date: datetime,
-) -> float:
+async def get_historical_erc20_balances(
+    wallet: Wallet, tokens: pd.DataFrame, target_date: datetime
+) -> "pd.Series[float]":
+    """balances of `tokens` (`contractAddress` and `decimal` columns) at `target_date`, in the order of `tokens`"""
     target_block = await get_block_by_timestamp(target_date, "before")
-    transactions = await transactions_from_now_to_target(wallet, target_block)
-    if not transactions.root:
-        logger.debug("no transactions found")
-        return current_balance
-
-    return current_balance - _calculate_balance_change_from_transactions(wallet, transactions)
-
-
-async def transactions_from_now_to_target(wallet: Wallet, target_block: int) -> ETHTransfersList:
-    params = QueryParams(
-        module="account",
-        action="txlist",
-        address=wallet.address,
-        startblock=target_block,
-        endblock=99999999,
-        sort="asc",
-        apikey=settings.ETHERSCAN_API_KEY,
+    timestamp = target_date.timestamp()
+    balances = pd.Series(dtype=float)
+    async for transfers in iter_etherscan_transactions(
+        "tokentx", wallet.address, 0, target_block, cache_ttl=ttl_for_window(target_date)
+    ):
+        balances = balances.add(_sum_signed_transfers(wallet, transfers, timestamp), fill_value=0.0)
+
+    raw_balances = tokens["contractAddress"].str.lower().map(balances).fillna(0.0)
+    return raw_balances / 10.0 ** tokens["decimal"].astype(int)
+
+
+def _sum_signed_transfers(wallet: Wallet, transfers: ETHTransfersList, timestamp: float) -> "pd.Series[float]":
+    """balance change per contract made by the transfers up to `timestamp`"""
+    chunk = pd.DataFrame(
+        transfers.model_dump(
+            by_alias=True, include={"__all__": {"time_stamp", "contract_address", "from_address", "to", "value"}}
+        ),
+        columns=["timeStamp", "contractAddress", "from", "to", "value"],
     )
-
-    response = await send_request("GET", settings.ETHERSCAN_API_BASE_URL, params=params)
-    return ETHTransfersList.model_validate(response.json()["result"])
-
-
-def _calculate_balance_change_from_transactions(wallet: Wallet, transactions: ETHTransfersList) -> float:
-    net_balance_change = 0.0
-    for tx in transactions.root:
-        # Convert value from Wei to Ether (1 Ether = 10^18 Wei)
-        logger.debug(tx)
-        logger.debug(f"Value: {tx.value}")
-        value_in_ether = int(tx.value) / 10**18
-
-        # Outgoing transaction
-        if tx.from_address.lower() == wallet.address.lower():
-            net_balance_change -= value_in_ether
-
-            # Calculate gas cost in Wei and convert to Ether
-            gas_cost_in_wei = int(tx.gas_used) * int(tx.gas_price)
-            gas_cost_in_ether = gas_cost_in_wei / 10**18
-            net_balance_change -= gas_cost_in_ether
-
-        # Incoming transaction
-        elif tx.to.lower() == wallet.address.lower():
-            net_balance_change += value_in_ether
-
-    return net_balance_change
+    chunk = chunk[chunk["timeStamp"].astype(float) <= timestamp]
+    address = wallet.address.lower()
+    values = chunk["value"].astype(float)
+    # a transfer to itself is both incoming and outgoing, so it does not change the balance
+    incoming = values.where(chunk["to"].str.lower() == address, 0.0)
+    outgoing = values.where(chunk["from"].str.lower() == address, 0.0)
+    return (incoming - outgoing).groupby(chunk["contractAddress"].str.lower()).sum()
@@ -6,16 +6,25 @@
 5. compare sum_from_genesis and (current_balance - sum_from_now)
 """
 
+from collections.abc import AsyncIterator
 from datetime import datetime
+from functools import partial
 
-from httpx import QueryParams
+import pandas as pd
 from loguru import logger
 
-from src.config import settings
 from src.core.dto import Wallet
-from src.core.http import send_request
-from src.modules.transfers.dto import ETHTransfersList
+from src.core.http.cache import ttl_for_window
+from src.modules.balances.services.ledger import (
+    CHANGES_COLUMNS,
+    get_historical_balances,
+    is_ledger_enabled,
+)
+from src.modules.transfers.dto import ETHTransfer, ETHTransfersList
 from src.modules.transfers.services.eth import get_block_by_timestamp
+from src.modules.transfers.services.etherscan import iter_etherscan_transactions
+
+_LATEST_BLOCK = 99999999
 
 
 async def get_historical_eth_balance(
@@ -23,49 +32,66 @@ async def get_historical_eth_balance(
     current_balance: float,
     target_date: datetime,
 ) -> float:
+    if is_ledger_enabled():
+        balances = await get_historical_balances(
+            wallet, "eth", target_date, {"ETH": current_balance}, partial(_fetch_balance_changes, wallet)
+        )
+        return balances["ETH"]
+
     target_block = await get_block_by_timestamp(target_date, "before")
-    transactions = await transactions_from_now_to_target(wallet, target_block)
-    if not transactions.root:
-        logger.debug("no transactions found")
-        return current_balance
+    balance_change = 0.0
+    async for transactions in transactions_from_now_to_target(wallet, target_block):
+        balance_change += _calculate_balance_change_from_transactions(wallet, transactions)
 
-    return current_balance - _calculate_balance_change_from_transactions(wallet, transactions)
+    return current_balance - balance_change
 
 
-async def transactions_from_now_to_target(wallet: Wallet, target_block: int) -> ETHTransfersList:
-    params = QueryParams(
-        module="account",
-        action="txlist",
-        address=wallet.address,
-        startblock=target_block,
-        endblock=99999999,
-        sort="asc",
-        apikey=settings.ETHERSCAN_API_KEY,
-    )
+async def _fetch_balance_changes(wallet: Wallet, start_date: datetime, end_date: datetime | None) -> pd.DataFrame:
+    # the window is cut by timestamps when recorded, the blocks only need to cover it
+    start_block = await get_block_by_timestamp(start_date, "before")
+    end_block = await get_block_by_timestamp(end_date, "before") if end_date is not None else _LATEST_BLOCK
+    cache_ttl = ttl_for_window(end_date) if end_date is not None else None
+    changes = [
+        pd.DataFrame(
+            {
+                "asset": "ETH",
+                "time": [float(tx.time_stamp) for tx in transactions.root],
+                "delta": [_get_balance_change(wallet, tx) for tx in transactions.root],
+            }
+        )
+        async for transactions in iter_etherscan_transactions(
+            "txlist", wallet.address, start_block, end_block, cache_ttl=cache_ttl
+        )
+    ]
+    return pd.concat(changes, ignore_index=True) if changes else pd.DataFrame(columns=CHANGES_COLUMNS)
 
-    response = await send_request("GET", settings.ETHERSCAN_API_BASE_URL, params=params)
-    return ETHTransfersList.model_validate(response.json()["result"])
+
+def transactions_from_now_to_target(wallet: Wallet, target_block: int) -> AsyncIterator[ETHTransfersList]:
+    return iter_etherscan_transactions("txlist", wallet.address, target_block, _LATEST_BLOCK)
 
 
 def _calculate_balance_change_from_transactions(wallet: Wallet, transactions: ETHTransfersList) -> float:
+    return sum((_get_balance_change(wallet, tx) for tx in transactions.root), 0.0)
+
+
+def _get_balance_change(wallet: Wallet, tx: ETHTransfer) -> float:
     net_balance_change = 0.0
-    for tx in transactions.root:
-        # Convert value from Wei to Ether (1 Ether = 10^18 Wei)
-        logger.debug(tx)
-        logger.debug(f"Value: {tx.value}")
-        value_in_ether = int(tx.value) / 10**18
-
-        # Outgoing transaction
-        if tx.from_address.lower() == wallet.address.lower():
-            net_balance_change -= value_in_ether
-
-            # Calculate gas cost in Wei and convert to Ether
-            gas_cost_in_wei = int(tx.gas_used) * int(tx.gas_price)
-            gas_cost_in_ether = gas_cost_in_wei / 10**18
-            net_balance_change -= gas_cost_in_ether
-
-        # Incoming transaction
-        elif tx.to.lower() == wallet.address.lower():
-            net_balance_change += value_in_ether
+    # Convert value from Wei to Ether (1 Ether = 10^18 Wei)
+    logger.debug(tx)
+    logger.debug(f"Value: {tx.value}")
+    value_in_ether = int(tx.value) / 10**18
+
+    # Outgoing transaction
+    if tx.from_address.lower() == wallet.address.lower():
+        net_balance_change -= value_in_ether
+
+        # Calculate gas cost in Wei and convert to Ether
+        gas_cost_in_wei = int(tx.gas_used) * int(tx.gas_price)
+        gas_cost_in_ether = gas_cost_in_wei / 10**18
+        net_balance_change -= gas_cost_in_ether
+
+    # Incoming transaction
+    elif tx.to.lower() == wallet.address.lower():
+        net_balance_change += value_in_ether
 
     return net_balance_change
@@ -1,14 +1,27 @@
 from datetime import UTC, datetime
-from typing import TypedDict
+from functools import partial
+from hashlib import sha256
+from math import isclose
+from typing import TypedDict, cast
 
 import pandas as pd
 from dateutil.utils import today
 from httpx import HTTPStatusError, QueryParams
 from loguru import logger
+from pytoniq import BlockIdExt, LiteClientLike
 
+from src.config import settings
+from src.core.concurrency import gather_limited
 from src.core.const import Side
 from src.core.dto import JettonAddressBook, Token, Wallet
 from src.core.http import send_request
+from src.core.jetton_wallets import resolve_jetton_wallets, to_raw_address
+from src.core.lite import get_masterchain_block, lite_client, retry_lite_query
+from src.modules.balances.services.ledger import (
+    get_historical_balances,
+    is_ledger_enabled,
+    to_timestamps,
+)
 from src.modules.prices.services.coinmarketcap import get_mean_price_for_month_from_cmc
 from src.modules.transfers.dto import TransfersReport
 from src.modules.transfers.services.ton import get_jetton_transfers
@@ -30,7 +43,7 @@ async def _get_current_jetton_balances(wallet: Wallet, jettons: JettonAddressBoo
     """current jetton balances using tonapi"""
     url = f"https://tonapi.io/v2/accounts/{wallet.address}/jettons"
     params = QueryParams(currencies="usd")
-    response = await send_request(method="GET", url=url, params=params)
+    response = await send_request(method="GET", url=url, params=params, operation="tonapi.jettons")
     balances: list[JettonBalance] = []
     for balance in response.json()["balances"]:
         if jetton := jettons.get(balance["jetton"]["address"]):
@@ -96,28 +109,19 @@ async def _handle_with_target_date(
     jetton_balances: list[JettonBalance],
     target_date: datetime,
 ) -> list[_JettonBalances]:
-    balance_changes: dict[str, float] = {}
-    transactions_df = await get_jetton_transfers(wallet, jettons, target_date, today(UTC))
-    transactions_df["network"] = "TON"
-    transactions = TransfersReport.model_validate(transactions_df.to_dict(orient="records"))
-    for transaction in transactions.root[::-1]:
-        if transaction.symbol not in balance_changes:
-            balance_changes[transaction.symbol] = 0.0
-
-        if transaction.side == Side.IN:
-            logger.debug(f"{transaction.symbol}: {balance_changes[transaction.symbol]} += {transaction.value}")
-            balance_changes[transaction.symbol] += transaction.value
-        else:
-            logger.debug(f"{transaction.symbol}: {balance_changes[transaction.symbol]} -= {transaction.value}")
-            balance_changes[transaction.symbol] -= transaction.value
+    if settings.JETTON_HISTORICAL_BALANCES == "liteserver":
+        target_balances = await _get_balances_at_block(wallet, jetton_balances, target_date)
+        if settings.JETTON_HISTORICAL_CROSS_CHECK:
+            replayed_balances = await _replay_balances(wallet, jettons, jetton_balances, target_date)
+            _cross_check_balances(wallet, target_balances, replayed_balances)
+    else:
+        target_balances = await _replay_balances(wallet, jettons, jetton_balances, target_date)
 
     result: list[_JettonBalances] = []
     for jetton_balance in jetton_balances:
 
         jetton = jetton_balance["jetton"]
-        balance_token = (jetton_balance["balance"] / 10 ** jetton_balance["decimals"]) - balance_changes.get(
-            jetton.symbol, 0
-        )
+        balance_token = target_balances[jetton.symbol]
         try:
             price = await get_mean_price_for_month_from_cmc(jetton.symbol, target_date)
             balance_usd = price.price_end_usd * balance_token if price else 0
@@ -136,3 +140,109 @@ async def _handle_with_target_date(
         )
 
     return result
+
+
+async def _get_balances_at_block(
+    wallet: Wallet, jetton_balances: list[JettonBalance], target_date: datetime
+) -> dict[str, float]:
+    """balances reported by `get_wallet_data` of every jetton wallet at the masterchain block of `target_date`"""
+    jettons = [jetton_balance["jetton"] for jetton_balance in jetton_balances]
+    jetton_wallets = await resolve_jetton_wallets(wallet.address, (jetton.address for jetton in jettons))
+    async with lite_client() as client:
+        block = await get_masterchain_block(client, target_date)
+        balances = await gather_limited(
+            (
+                _get_jetton_wallet_balance(client, jetton_wallets[to_raw_address(jetton.address)], block)
+                for jetton in jettons
+            ),
+            limit=settings.LITE_CONCURRENCY,
+        )
+
+    return {
+        jetton_balance["jetton"].symbol: balance / 10 ** jetton_balance["decimals"]
+        for jetton_balance, balance in zip(jetton_balances, balances, strict=True)
+    }
+
+
+async def _get_jetton_wallet_balance(client: LiteClientLike, jetton_wallet: str, block: BlockIdExt) -> int:
+    # a jetton wallet is deployed with the first transfer to it, before that it has no state and no balance
+    account, _ = await retry_lite_query(
+        partial(client.raw_get_account_state, jetton_wallet, block), f"account state of {jetton_wallet}"
+    )
+    if account is None or account.storage.state.type_ != "account_active":
+        return 0
+
+    wallet_data = await retry_lite_query(
+        partial(client.run_get_method, address=jetton_wallet, method="get_wallet_data", stack=[], block=block),
+        f"get_wallet_data of {jetton_wallet}",
+    )
+    return cast(int, wallet_data[0])
+
+
+async def _replay_balances(
+    wallet: Wallet, jettons: JettonAddressBook, jetton_balances: list[JettonBalance], target_date: datetime
+) -> dict[str, float]:
+    """current balances minus the transfers since `target_date`"""
+    current_balances = {
+        jetton_balance["jetton"].symbol: jetton_balance["balance"] / 10 ** jetton_balance["decimals"]
+        for jetton_balance in jetton_balances
+    }
+    if is_ledger_enabled():
+        return await get_historical_balances(
+            wallet,
+            _get_ledger_source(jettons),
+            target_date,
+            current_balances,
+            partial(_fetch_balance_changes, wallet, jettons),
+        )
+
+    balance_changes = await _get_balance_changes(wallet, jettons, target_date)
+    return {symbol: balance - balance_changes.get(symbol, 0) for symbol, balance in current_balances.items()}
+
+
+def _cross_check_balances(wallet: Wallet, balances: dict[str, float], replayed_balances: dict[str, float]) -> None:
+    for symbol, balance in balances.items():
+        replayed_balance = replayed_balances[symbol]
+        if not isclose(balance, replayed_balance, rel_tol=1e-9, abs_tol=1e-9):
+            logger.warning(
+                f"{wallet.account_name} {symbol}: {balance} on chain, {replayed_balance} replayed from transfers"
+            )
+
+
+async def _get_balance_changes(wallet: Wallet, jettons: JettonAddressBook, target_date: datetime) -> dict[str, float]:
+    balance_changes: dict[str, float] = {}
+    transactions_df = await get_jetton_transfers(wallet, jettons, target_date, today(UTC))
+    transactions_df["network"] = "TON"
+    transactions = TransfersReport.model_validate(transactions_df.to_dict(orient="records"))
+    for transaction in transactions.root[::-1]:
+        if transaction.symbol not in balance_changes:
+            balance_changes[transaction.symbol] = 0.0
+
+        if transaction.side == Side.IN:
+            logger.debug(f"{transaction.symbol}: {balance_changes[transaction.symbol]} += {transaction.value}")
+            balance_changes[transaction.symbol] += transaction.value
+        else:
+            logger.debug(f"{transaction.symbol}: {balance_changes[transaction.symbol]} -= {transaction.value}")
+            balance_changes[transaction.symbol] -= transaction.value
+
+    return balance_changes
+
+
+async def _fetch_balance_changes(
+    wallet: Wallet, jettons: JettonAddressBook, start_date: datetime, end_date: datetime | None
+) -> pd.DataFrame:
+    transfers = await get_jetton_transfers(wallet, jettons, start_date, end_date or datetime.now(UTC))
+    values = transfers["value"].astype(float)
+    return pd.DataFrame(
+        {
+            "asset": transfers["symbol"],
+            "time": to_timestamps(transfers["time"]),
+            "delta": values.where(transfers["side"] == Side.IN, -values),
+        }
+    )
+
+
+def _get_ledger_source(jettons: JettonAddressBook) -> str:
+    """changes are fetched for the whole address book, so every address book has its own synced range"""
+    addresses = ",".join(sorted(token.address.lower() for token in jettons.root))
+    return f"jettons:{sha256(addresses.encode()).hexdigest()[:16]}"
@@ -0,0 +1,188 @@
+"""
+Local ledger of wallet balance changes.
+
+Changes are stored per wallet, source (`ton`, `eth`, jettons...) and asset together with the synced time range
+of every (wallet, source), current balances are stored as checkpoints.
+A balance at a past date is the nearest later checkpoint minus the changes in between,
+every report only fetches the changes outside of the already synced range.
+"""
+
+import sqlite3
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+
+import pandas as pd
+
+from src.config import settings
+from src.core.dto import Wallet
+from src.core.sqlite import connect
+
+__all__ = (
+    "CHANGES_COLUMNS",
+    "FetchChanges",
+    "Ledger",
+    "get_historical_balances",
+    "is_ledger_enabled",
+    "ledger",
+    "to_timestamps",
+)
+
+CHANGES_COLUMNS = ["asset", "time", "delta"]
+"""columns of the changes frame: asset, unix time in seconds and signed balance change"""
+
+type FetchChanges = Callable[[datetime, datetime | None], Awaitable[pd.DataFrame]]
+"""changes between two dates, an end of `None` is open-ended: up to the latest data of the upstream"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    wallet TEXT NOT NULL,
+    source TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    time REAL NOT NULL,
+    delta REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_wallet_source_time ON changes (wallet, source, time);
+CREATE TABLE IF NOT EXISTS cursors (
+    wallet TEXT NOT NULL,
+    source TEXT NOT NULL,
+    synced_from REAL NOT NULL,
+    synced_to REAL NOT NULL,
+    PRIMARY KEY (wallet, source)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    wallet TEXT NOT NULL,
+    source TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    time REAL NOT NULL,
+    balance REAL NOT NULL,
+    PRIMARY KEY (wallet, source, asset, time)
+);
+"""
+
+
+def is_ledger_enabled() -> bool:
+    """
+    past balances come from the ledger unless upstream fixtures are recorded or replayed
+    (the windows fetched depend on the local synced range and on now, a replay would ask for other ones)
+    """
+    return settings.LEDGER_ENABLED and settings.UPSTREAM_FIXTURES_MODE == "off"
+
+
+def to_timestamps(times: "pd.Series[pd.Timestamp]") -> "pd.Series[float]":
+    """datetimes (naive ones are UTC) to unix seconds"""
+    return (pd.to_datetime(times, utc=True) - pd.Timestamp(0, tz=UTC)) / pd.Timedelta(seconds=1)
+
+
+class Ledger:
+    __slots__ = ("_connection",)
+
+    def __init__(self) -> None:
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect(settings.LEDGER_PATH, _SCHEMA)
+        return self._connection
+
+    def synced_range(self, wallet: str, source: str) -> tuple[float, float] | None:
+        row = self.connection.execute(
+            "SELECT synced_from, synced_to FROM cursors WHERE wallet = ? AND source = ?", (wallet, source)
+        ).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    def record(self, wallet: str, source: str, start: float, end: float, changes: pd.DataFrame) -> None:
+        """
+        replace the changes within [start, end] and extend the synced range,
+        the window must overlap or touch the range that is already synced
+        """
+        changes = changes[(changes["time"] >= start) & (changes["time"] <= end)]
+        rows = [
+            (wallet, source, asset, time, delta)
+            for asset, time, delta in changes[CHANGES_COLUMNS].itertuples(index=False, name=None)
+        ]
+        with self._transaction():
+            self.connection.execute(
+                "DELETE FROM changes WHERE wallet = ? AND source = ? AND time >= ? AND time <= ?",
+                (wallet, source, start, end),
+            )
+            self.connection.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?)", rows)
+            self.connection.execute(
+                """
+                INSERT INTO cursors VALUES (?, ?, ?, ?)
+                ON CONFLICT (wallet, source) DO UPDATE SET
+                    synced_from = MIN(synced_from, excluded.synced_from),
+                    synced_to = MAX(synced_to, excluded.synced_to)
+                """,
+                (wallet, source, start, end),
+            )
+
+    def checkpoint(self, wallet: str, source: str, time: float, balances: dict[str, float]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+            [(wallet, source, asset, time, balance) for asset, balance in balances.items()],
+        )
+
+    def balances_at(self, wallet: str, source: str, time: float) -> dict[str, float]:
+        """balances right before `time` of every asset with a checkpoint at or after it"""
+        rows = self.connection.execute(
+            """
+            SELECT checkpoint.asset, checkpoint.balance - COALESCE((
+                SELECT SUM(delta) FROM changes
+                WHERE wallet = checkpoint.wallet AND source = checkpoint.source AND asset = checkpoint.asset
+                    AND time >= :time AND time <= checkpoint.time
+            ), 0)
+            FROM checkpoints AS checkpoint
+            WHERE wallet = :wallet AND source = :source AND time = (
+                SELECT MIN(time) FROM checkpoints
+                WHERE wallet = checkpoint.wallet AND source = checkpoint.source AND asset = checkpoint.asset
+                    AND time >= :time
+            )
+            """,
+            {"wallet": wallet, "source": source, "time": time},
+        )
+        return dict(rows.fetchall())
+
+    def _transaction(self) -> sqlite3.Connection:
+        # the connection is in autocommit mode, `with` only commits or rolls back an explicitly started transaction
+        self.connection.execute("BEGIN")
+        return self.connection
+
+
+ledger = Ledger()
+
+
+async def get_historical_balances(
+    wallet: Wallet,
+    source: str,
+    target_date: datetime,
+    current_balances: dict[str, float],
+    fetch_changes: FetchChanges,
+) -> dict[str, float]:
+    """
+    Balances of the assets from `current_balances` at `target_date`.
+    The current balances become a checkpoint and only the changes that are not in the ledger yet are fetched:
+    the ones before the synced range and the ones after its (re-synced) tail.
+    """
+    now = datetime.now(UTC)
+    start, end = target_date.timestamp(), now.timestamp()
+    windows: list[tuple[float, float]] = []
+    if (synced := ledger.synced_range(wallet.address, source)) is None:
+        windows.append((start, end))
+    else:
+        synced_from, synced_to = synced
+        if start < synced_from:
+            windows.append((start, synced_from))
+        windows.append((max(synced_from, min(synced_to, end) - settings.LEDGER_RESYNC_SECONDS), end))
+
+    for window_start, window_end in windows:
+        # the tail window reaches now, it is fetched open-ended and cut at `end` when recorded
+        changes = await fetch_changes(
+            datetime.fromtimestamp(window_start, UTC),
+            datetime.fromtimestamp(window_end, UTC) if window_end < end else None,
+        )
+        ledger.record(wallet.address, source, window_start, window_end, changes)
+
+    ledger.checkpoint(wallet.address, source, end, current_balances)
+    balances = ledger.balances_at(wallet.address, source, start)
+    return {asset: balances[asset] for asset in current_balances}
@@ -47,5 +47,6 @@ async def get_current_ton_balance(wallet: Wallet) -> float:
         url=f"{TONCENTER_API_URL}/account",
         params=params,
         follow_redirects=True,
+        operation="toncenter.account",
     )
     return float(response.json()["balance"]) / 1e9
@@ -3,6 +3,15 @@ from fastapi.responses import PlainTextResponse
 from loguru import logger
 from pydantic import ValidationError
 
+from src.core.exceptions import RequestException
+from src.core.http.retry import CircuitState, circuit_breakers
+from src.core.metrics import (
+    SINGLEFLIGHT_CALLS,
+    SINGLEFLIGHT_COALESCED,
+    UPSTREAM_CIRCUIT_OPEN,
+    render_metrics,
+)
+from src.core.singleflight import singleflight_groups
 from src.modules.metrics.dto import TVLMetrics
 from src.modules.metrics.services.metrics import generate_tvl_metrics
 
@@ -11,13 +20,31 @@ router = APIRouter(prefix="", tags=["metrics"])
 
 @router.get("/metrics", response_class=PlainTextResponse)
 async def get_tvl_metrics() -> Response:
-    tvl_daily = await generate_tvl_metrics()
-    tvl_metrics_last_row = tvl_daily.iloc[-1].to_dict()
-
     try:
-        TVLMetrics.model_validate(tvl_metrics_last_row)
-        tvl_metrics_lst = [f"{key} {item}" for key, item in tvl_metrics_last_row.items()]
-        return Response("\n".join(tvl_metrics_lst), media_type="text/plain")
+        tvl_metrics = await _render_tvl_metrics()
     except ValidationError as e:
         logger.exception(e)
         raise HTTPException(status_code=422, detail=e.errors()) from e
+    except (RequestException, Exception) as e:
+        # the upstream metrics are still rendered when DefiLlama fails, they are the ones that tell why
+        logger.error(f"TVL metrics are not available: {e!r}")
+        tvl_metrics = ""
+
+    return Response(tvl_metrics + _render_upstream_metrics(), media_type="text/plain")
+
+
+async def _render_tvl_metrics() -> str:
+    tvl_daily = await generate_tvl_metrics()
+    tvl_metrics_last_row = tvl_daily.iloc[-1].to_dict()
+    TVLMetrics.model_validate(tvl_metrics_last_row)
+    return "".join(f"{key} {item}\n" for key, item in tvl_metrics_last_row.items())
+
+
+def _render_upstream_metrics() -> str:
+    """upstream latencies, retries and bytes, plus a snapshot of circuit breakers and singleflight groups"""
+    for host, breaker in circuit_breakers.items():
+        UPSTREAM_CIRCUIT_OPEN.set(host, value=int(breaker.state != CircuitState.CLOSED))
+    for name, group in singleflight_groups.items():
+        SINGLEFLIGHT_CALLS.set(name, value=group.calls)
+        SINGLEFLIGHT_COALESCED.set(name, value=group.coalesced)
+    return render_metrics()
@@ -1,12 +1,12 @@
 import pandas as pd
 
-from src.core.http import send_request
 from src.modules.metrics.services.constants import (
     EXPECTED_DURATION,
     RUN_VALIDATOR_NUMBER,
     SMA_WEEKS,
     TON_PER_VALUE,
 )
+from src.modules.tvl_apy.services.tvl import get_defilama_ton_tvl
 
 
 def sma(series: "pd.Series[float]", window: int) -> "pd.Series[float]":
@@ -17,13 +17,14 @@ def sma(series: "pd.Series[float]", window: int) -> "pd.Series[float]":
 
 
 async def generate_tvl_metrics() -> pd.DataFrame:
-
-    response = await send_request(method="GET", url="https://api.llama.fi/protocol/bemo")
-
-    data = response.json()["chainTvls"]["TON"]
-
-    tvl_daily = pd.DataFrame(data["tokens"])
-    tvl_daily["tokens"] = tvl_daily["tokens"].apply(lambda x: x["TON"])
+    data = await get_defilama_ton_tvl("bemo")
+
+    tvl_daily = pd.DataFrame(
+        {
+            "date": [point["date"] for point in data["tokens"]],
+            "tokens": [point["tokens"]["TON"] for point in data["tokens"]],
+        }
+    )
     tvl_daily["tvl"] = tvl_daily["tokens"].astype(float)
     tvl_daily["date"] = pd.to_datetime(tvl_daily["date"], unit="s")
     tvl_daily["delta"] = tvl_daily["tvl"] - tvl_daily["tvl"].shift(1).fillna(tvl_daily["tvl"].iloc[0])
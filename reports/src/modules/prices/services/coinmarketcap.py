@@ -8,6 +8,7 @@ from typing_extensions import Doc
 
 from src.config import settings
 from src.core.http import send_request
+from src.core.singleflight import singleflight
 from src.modules.prices.dto import DailyPrice, DailyPrices, Price, Prices
 from src.modules.prices.services.utils import (
     get_fiat_daily_prices_for_month,
@@ -78,6 +79,7 @@ async def get_daily_prices_for_symbols_per_month(
     return prices
 
 
+@singleflight
 async def get_mean_price_for_month_from_cmc(token_symbol: str, target_date: datetime | None = None) -> Price | None:
     price_list = await _get_price_list_from_cmc(token_symbol, target_date)
     if price_list.empty:
@@ -121,12 +123,14 @@ async def _get_price_list_from_cmc(token_symbol: str, target_date: datetime | No
     return price_list
 
 
+@singleflight
 async def _fetch_price_points_from_cmc(token_symbol: str, target_date: datetime | None = None) -> _TPOINTS:
     token_id = await _get_id_of_token_for_cmc(token_symbol)
     response = await send_request(
         method="GET",
         url="https://api.coinmarketcap.com/data-api/v3/cryptocurrency/detail/chart",
         params=QueryParams(id=token_id, range="1Y" if target_date else "1M"),
+        operation="coinmarketcap.chart",
     )
     return cast(_TPOINTS, response.json()["data"]["points"])
 
@@ -155,5 +159,7 @@ async def _get_id_of_token_for_cmc(symbol: str) -> int:
         params=QueryParams(symbol=symbol),
         headers=Headers({"X-CMC_PRO_API_KEY": str(settings.CMC_API_KEY)}),
         no_retries=True,
+        cache_ttl=24 * 60 * 60,
+        operation="coinmarketcap.info",
     )
     return cast(int, response.json()["data"][symbol.upper()][0]["id"])
@@ -27,6 +27,7 @@ async def convert_currency(value: float, from_: str, to: str = "USD") -> float:
     response = await send_request(
         method="GET",
         url=f"{CONVERTER_API_URL}/{from_.lower()}/{to.lower()}?amount={value}",
+        operation="coinconvert.convert",
     )
     logger.debug(f"Converted {from_.upper()} to {to.upper()}: {response.json()}")
     return float(response.json()[to.upper()])
@@ -123,6 +124,7 @@ async def _get_rates_for_every_day_of_month(month_date: date, to: str | list[str
             method="GET",
             url=url.format(date=date_),
             params=params,
+            operation="openexchangerates.historical",
         )
         rates.append(Rates(date=date_, rates=response.json()["rates"]))
 
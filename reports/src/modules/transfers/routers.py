@@ -3,12 +3,18 @@ from datetime import UTC
 
 import pandas as pd
 from dateutil.utils import today
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 from loguru import logger
 
+from src.config import settings
+from src.core.concurrency import gather_limited_settled
 from src.core.const import Network
-from src.core.dto import JettonAddressBook, Wallets
-from src.core.utils import get_start_and_end_dates_for_request, get_wallet_network
+from src.core.dto import JettonAddressBook, Wallet, Wallets
+from src.core.utils import (
+    collect_wallet_reports,
+    get_start_and_end_dates_for_request,
+    get_wallet_network,
+)
 from src.modules.transfers.dto import TransfersReport
 from src.modules.transfers.services.eth import get_eth_wallet_token_transfers
 from src.modules.transfers.services.ton import get_ton_transfers
@@ -19,6 +25,7 @@ router = APIRouter(prefix="/transfers", tags=["reports"])
 @router.post("/")
 async def generate_transfers_report(
     *,
+    response: Response,
     wallets: Wallets,
     jettons: JettonAddressBook,
     month: int = Query(ge=1, le=12),
@@ -32,9 +39,8 @@ async def generate_transfers_report(
 
     logger.debug(f"Generating report for {month=}")
     start_date, end_date = get_start_and_end_dates_for_request(month, year)
-    transfers_dfs: list[pd.DataFrame] = []
 
-    for wallet in wallets.root:
+    async def get_wallet_transfers(wallet: Wallet) -> pd.DataFrame:
         if get_wallet_network(wallet) is Network.ETH:
             transfers_report = await get_eth_wallet_token_transfers(wallet, start_date, end_date)
         else:
@@ -43,7 +49,10 @@ async def generate_transfers_report(
         if not transfers_report.empty:
             with contextlib.suppress(KeyError):
                 transfers_report["date"] = pd.to_datetime(transfers_report["date"]).dt.tz_localize("UTC").dt.normalize()
+        return transfers_report
 
-        transfers_dfs.append(transfers_report)
-
+    results = await gather_limited_settled(
+        (get_wallet_transfers(wallet) for wallet in wallets.root), limit=settings.REPORT_WALLETS_CONCURRENCY
+    )
+    transfers_dfs = collect_wallet_reports(wallets.root, results, response)
     return TransfersReport.model_validate(pd.concat(transfers_dfs).to_dict(orient="records"))
@@ -0,0 +1,117 @@
+from asyncio import Semaphore, Task, create_task
+from collections.abc import AsyncGenerator, Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from loguru import logger
+
+from src.config import settings
+from src.core.const import DTON_TIMEZONE, DTON_URL
+from src.core.exceptions import RequestException
+from src.core.http import send_request
+from src.core.http.cache import ttl_for_window
+from src.modules.transfers.dto import DTONQuery
+
+__all__ = ("iter_dton_pages", "iter_dton_windows")
+
+type DTONTransaction = dict[str, Any]
+
+DTON_QUERY = """
+{{
+  raw_transactions(
+    {filters}
+  ) {{
+    {attributes}
+  }}
+}}
+"""
+
+_UNQUOTED_FILTERS = frozenset({"lt__lt", "workchain"})
+
+
+async def iter_dton_pages(
+    filters: dict[str, Any], attributes: Iterable[str], cache_ttl: float | None = None
+) -> AsyncGenerator[list[DTONTransaction], None]:
+    """
+    `raw_transactions` matching `filters` page by page, newest first.
+    Every next page asks for the transactions older than the last one (`lt__lt`) until a page comes back empty
+    """
+    attributes = list(dict.fromkeys([*attributes, "lt"]))
+    filters = dict(filters)
+    while page := await _fetch_page(filters, attributes, cache_ttl):
+        logger.debug(f"{len(page)} more transactions")
+        yield page
+        filters["lt__lt"] = int(page[-1]["lt"])
+
+
+async def iter_dton_windows(
+    filters: dict[str, Any], attributes: Iterable[str], start: datetime, end: datetime | None = None
+) -> AsyncGenerator[list[DTONTransaction], None]:
+    """
+    `raw_transactions` matching `filters` generated from `start` to `end` (now by default), newest first.
+    The time range is split into `DTON_WINDOW_SECONDS` sub-windows that are paginated concurrently (`DTON_CONCURRENCY`),
+    one list of transactions is yielded per sub-window. Naive datetimes are UTC.
+    """
+    attributes = list(attributes)
+    semaphore = Semaphore(settings.DTON_CONCURRENCY)
+
+    async def fetch_window(window_start: datetime, window_end: datetime) -> list[DTONTransaction]:
+        window_filters = {**filters, "gen_utime__gte": window_start, "gen_utime__lte": window_end}
+        async with semaphore:
+            return [
+                transaction
+                async for page in iter_dton_pages(window_filters, attributes, ttl_for_window(window_end))
+                for transaction in page
+            ]
+
+    tasks: list[Task[list[DTONTransaction]]] = [
+        create_task(fetch_window(*window)) for window in _split_window(start, end or datetime.now(UTC))
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _split_window(start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    sub-windows of at most `DTON_WINDOW_SECONDS` from the newest one, both bounds are inclusive up to a second.
+    Sub-windows are aligned to multiples of the window size since the epoch, so only the ones holding `start`
+    and `end` depend on them and the rest keep the same queries (fixtures, cached responses) from run to run
+    """
+    size = settings.DTON_WINDOW_SECONDS
+    first, last = int(_as_utc(start).timestamp()), int(_as_utc(end).timestamp())
+    windows: list[tuple[datetime, datetime]] = []
+    while last >= first:
+        window_start = max(first, last - last % size)
+        windows.append((datetime.fromtimestamp(window_start, UTC), datetime.fromtimestamp(last, UTC)))
+        last = window_start - 1
+    return windows
+
+
+def _as_utc(date_: datetime) -> datetime:
+    return date_.replace(tzinfo=UTC) if date_.tzinfo is None else date_
+
+
+def _format_filter(key: str, value: Any) -> str:
+    if isinstance(value, datetime):
+        # DTON filters `gen_utime` in Moscow time
+        value = _as_utc(value).astimezone(DTON_TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S")
+    return f"{key}: {value}" if key in _UNQUOTED_FILTERS else f'{key}: "{value}"'
+
+
+async def _fetch_page(filters: dict[str, Any], attributes: list[str], cache_ttl: float | None) -> list[DTONTransaction]:
+    query = DTON_QUERY.format(
+        filters="\n".join(_format_filter(key, value) for key, value in filters.items()),
+        attributes="\n".join(attributes),
+    )
+    response = await send_request(
+        "POST", DTON_URL, data=DTONQuery(query=query), cache_ttl=cache_ttl, operation="dton.raw_transactions"
+    )
+    data = response.json()
+    if errors := data.get("errors"):
+        raise RequestException(f"DTON query failed: {errors}")
+
+    return data["data"]["raw_transactions"] or []
@@ -1,20 +1,31 @@
-from datetime import datetime
+from datetime import UTC, datetime
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 from httpx import QueryParams
 
 from src.config import settings
+from src.core.block_index import BlockSample, find_block, is_indexable
 from src.core.const import Network, Side
 from src.core.dto import Wallet
 from src.core.http import send_request
+from src.core.http.cache import ttl_for_window
+from src.core.singleflight import singleflight
 from src.modules.transfers.dto import ETHTransfersList
+from src.modules.transfers.services.etherscan import iter_etherscan_transactions
 
 __all__ = ("get_eth_wallet_token_transfers",)
 
 TOKEN_LIST_ETH = pd.read_csv(settings.TOKEN_LIST_ETH_CSV)
 ADDRESS_BOOK_ETH = pd.read_csv(settings.ADDRESS_BOOK_ETH_CSV)
 ADDRESS_BOOK_ETH["address"] = ADDRESS_BOOK_ETH["address"].str.lower()
+# hash lookups built once: contracts of the listed tokens and address book notes by lowercased address
+_LISTED_TOKENS = frozenset(TOKEN_LIST_ETH["contractAddress"])
+_ADDRESS_NOTES = dict(zip(ADDRESS_BOOK_ETH["address"], ADDRESS_BOOK_ETH["note"], strict=True))
+
+_TRANSFER_FIELDS = {"time_stamp", "from_address", "to", "contract_address", "value", "token_symbol", "token_decimal"}
+_TRANSFER_COLUMNS = ["timeStamp", "from", "to", "contractAddress", "value", "tokenSymbol", "tokenDecimal"]
 
 
 async def get_eth_wallet_token_transfers(
@@ -22,48 +33,79 @@ async def get_eth_wallet_token_transfers(
     start_date: datetime,
     end_date: datetime,
 ) -> pd.DataFrame:
-    params = QueryParams(
-        module="account",
-        action="tokentx",
-        address=wallet.address,
-        startblock=await get_block_by_timestamp(start_date, "after"),
-        endblock=await get_block_by_timestamp(end_date, "before"),
-        sort="asc",
-        apikey=settings.ETHERSCAN_API_KEY,
-    )
-    response = await send_request("GET", settings.ETHERSCAN_API_BASE_URL, params)
-    data = ETHTransfersList.model_validate(response.json()["result"])
-    return _parse_token_transfers(data, wallet)
+    # every chunk is filtered down to the listed tokens before the next one is fetched
+    transfers = [
+        _parse_token_transfers(data, wallet)
+        async for data in iter_etherscan_transactions(
+            "tokentx",
+            wallet.address,
+            await get_block_by_timestamp(start_date, "after"),
+            await get_block_by_timestamp(end_date, "before"),
+            cache_ttl=ttl_for_window(end_date),
+        )
+    ]
+    if not transfers:
+        return _parse_token_transfers(ETHTransfersList([]), wallet)
+    return pd.concat(transfers, ignore_index=True)
 
 
 def _parse_token_transfers(data: ETHTransfersList, wallet: Wallet) -> pd.DataFrame:
-    if not (transfers := data.model_dump(by_alias=True)):
+    if not data.root:
         return pd.DataFrame(columns=["time", "side", "value", "symbol", "address", "account_name"])
 
-    token_transfers = pd.DataFrame(transfers)
-    token_transfers["time"] = pd.to_datetime(token_transfers["timeStamp"].astype(int), unit="s", utc=True)
-    token_transfers["value"] = token_transfers["value"].astype(float) / (
-        10 ** token_transfers["tokenDecimal"].astype(int)
+    token_transfers = pd.DataFrame(
+        data.model_dump(by_alias=True, include={"__all__": _TRANSFER_FIELDS}), columns=_TRANSFER_COLUMNS
     )
-    token_transfers[["side", "address"]] = token_transfers.apply(
-        lambda x: pd.Series((Side.IN, x["from"]) if x["to"].lower() == wallet.address.lower() else (Side.OUT, x["to"])),
-        axis=1,
+    token_transfers = token_transfers[token_transfers["contractAddress"].isin(_LISTED_TOKENS)]
+
+    incoming = token_transfers["to"].str.lower() == wallet.address.lower()
+    address = token_transfers["from"].where(incoming, token_transfers["to"])
+    final_transfers = pd.DataFrame(
+        {
+            "time": pd.to_datetime(token_transfers["timeStamp"].astype(int), unit="s", utc=True),
+            "from": token_transfers["from"],
+            "to": token_transfers["to"],
+            "symbol": token_transfers["tokenSymbol"],
+            "value": token_transfers["value"].astype(float) / (10 ** token_transfers["tokenDecimal"].astype(int)),
+            "side": np.where(incoming, Side.IN, Side.OUT),
+            "note": address.map(_ADDRESS_NOTES),
+            "address": address,
+            "account_name": wallet.account_name,
+            "network": Network.ETH,
+        }
     )
-    filtered_transfers = token_transfers[token_transfers["contractAddress"].isin(TOKEN_LIST_ETH["contractAddress"])]
-    merged_transfers = filtered_transfers.merge(ADDRESS_BOOK_ETH, on="address", how="left")
-    final_transfers = merged_transfers[["time", "from", "to", "tokenSymbol", "value", "side", "note", "address"]]
-    final_transfers["account_name"] = wallet.account_name
-    final_transfers["network"] = Network.ETH
-    return final_transfers.rename(columns={"tokenSymbol": "symbol"}).fillna("")
+    return final_transfers.reset_index(drop=True).fillna("")
 
 
+@singleflight
 async def get_block_by_timestamp(date: datetime, closest: Literal["before", "after"]) -> int:
+    timestamp = int(date.timestamp())
+    if not is_indexable(date):
+        return await _get_block_number_by_time(timestamp, closest)
+
+    # block timestamps strictly increase, the first block at or after a timestamp follows the last one before it
+    if closest == "before":
+        return (await find_block("eth", timestamp, _lookup_block))["block"]
+    return (await find_block("eth", timestamp - 1, _lookup_block))["block"] + 1
+
+
+async def _lookup_block(timestamp: int) -> BlockSample:
+    return {"timestamp": timestamp, "block": await _get_block_number_by_time(timestamp, "before"), "data": None}
+
+
+async def _get_block_number_by_time(timestamp: int, closest: Literal["before", "after"]) -> int:
     params = QueryParams(
         module="block",
         action="getblocknobytime",
-        timestamp=int(date.timestamp()),
+        timestamp=timestamp,
         closest=closest,
         apikey=settings.ETHERSCAN_API_KEY,
     )
-    response = await send_request(method="GET", url=settings.ETHERSCAN_API_BASE_URL, params=params)
+    response = await send_request(
+        method="GET",
+        url=settings.ETHERSCAN_API_BASE_URL,
+        params=params,
+        cache_ttl=ttl_for_window(datetime.fromtimestamp(timestamp, UTC)),
+        operation="etherscan.getblocknobytime",
+    )
     return int(response.json()["result"])
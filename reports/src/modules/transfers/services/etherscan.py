@@ -0,0 +1,87 @@
+from collections.abc import AsyncGenerator
+from typing import Final, Literal
+
+from httpx import QueryParams
+
+from src.config import settings
+from src.core.exceptions import RequestException
+from src.core.http import send_request
+from src.modules.transfers.dto import ETHTransfersList
+
+__all__ = ("iter_etherscan_transactions",)
+
+ETHERSCAN_MAX_RESULTS: Final = 10_000
+"""Etherscan silently stops at `page * offset` = 10k rows of one query"""
+# windows are sized to hold about half of the cap, so the density estimate has room to be wrong
+_TARGET_WINDOW_RESULTS: Final = ETHERSCAN_MAX_RESULTS // 2
+
+
+async def iter_etherscan_transactions(
+    action: Literal["txlist", "tokentx"],
+    address: str,
+    start_block: int,
+    end_block: int,
+    cache_ttl: float | None = None,
+) -> AsyncGenerator[ETHTransfersList, None]:
+    """
+    Transactions of `address` from `start_block` to `end_block` (inclusive) in ascending order, one page per chunk.
+
+    Block windows are paged with `page`/`offset` below Etherscan's 10k rows cap.
+    The first window is the whole range, a window that reaches the cap is continued from its last block
+    (whose rows may be cut, so they are fetched again), and the next window is sized
+    from the density of transactions in the previous one.
+    """
+    page_size = settings.ETHERSCAN_PAGE_SIZE
+    max_pages = ETHERSCAN_MAX_RESULTS // page_size
+    low, span = start_block, end_block - start_block + 1
+
+    while low <= end_block:
+        high = min(low + span - 1, end_block)
+        results = 0
+        for page in range(1, max_pages + 1):
+            chunk = await _get_page(action, address, low, high, page, page_size, cache_ttl)
+            results += len(chunk.root)
+            if len(chunk.root) < page_size:
+                if chunk.root:
+                    yield chunk
+                next_low = high + 1
+                break
+
+            if page == max_pages:
+                last_block = int(chunk.root[-1].block_number)
+                if last_block == low:
+                    raise RequestException(f"more than {ETHERSCAN_MAX_RESULTS} transactions in block {low}")
+                yield ETHTransfersList([tx for tx in chunk.root if int(tx.block_number) != last_block])
+                high = next_low = last_block
+            else:
+                yield chunk
+
+        # an empty window means the rest is sparse, it is asked at once and split only if it reaches the cap
+        density = results / (high - low + 1)
+        span = max(1, int(_TARGET_WINDOW_RESULTS / density)) if density else end_block - high
+        low = next_low
+
+
+async def _get_page(
+    action: str, address: str, start_block: int, end_block: int, page: int, page_size: int, cache_ttl: float | None
+) -> ETHTransfersList:
+    params = QueryParams(
+        module="account",
+        action=action,
+        address=address,
+        startblock=start_block,
+        endblock=end_block,
+        page=page,
+        offset=page_size,
+        sort="asc",
+        apikey=settings.ETHERSCAN_API_KEY,
+    )
+    response = await send_request(
+        "GET", settings.ETHERSCAN_API_BASE_URL, params, cache_ttl=cache_ttl, operation=f"etherscan.{action}"
+    )
+    data = response.json()
+    if data["status"] != "1":
+        if data["message"] == "No transactions found":
+            return ETHTransfersList([])
+        raise RequestException(f"etherscan {action}: {data['message']} {data['result']}")
+    return ETHTransfersList.model_validate(data["result"])
@@ -8,6 +8,7 @@ from pytoniq import Address
 from src.core.const import JettonActionType, Side
 from src.core.dto import JettonTransaction, JettonWallet
 from src.core.http import send_request
+from src.core.http.cache import ttl_for_window
 from src.modules.transfers.services.bemo_staking import fetch_bemo_staking_transactions
 from src.modules.transfers.services.const import EVAA_ADDRESS
 
@@ -42,7 +43,9 @@ async def _fetch_transactions_from_tonapi(
     result = []
 
     while True:
-        response = await send_request("GET", url, params=params)
+        response = await send_request(
+            "GET", url, params=params, cache_ttl=ttl_for_window(end_date), operation="tonapi.events"
+        )
         transactions, next_lt = _parse_tonapi_response(wallet, response)
         result.extend(transactions)
         if not next_lt:
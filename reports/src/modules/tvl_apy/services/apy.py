@@ -1,58 +1,31 @@
-from asyncio import sleep
 from collections.abc import AsyncGenerator, Generator, Iterable
 from datetime import datetime
+from functools import partial
 from typing import cast
 
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from loguru import logger
-from pytoniq import (
-    BlockIdExt,
-    LiteBalancer,
-    LiteClientError,
-    LiteClientLike,
-    LiteServerError,
-)
+from pytoniq import BlockIdExt, LiteClientLike
 
 from src.config import settings
-from src.core.utils import get_config
-
-
-async def _get_block(client: LiteClientLike, date_: datetime) -> BlockIdExt:
-    ts = int(date_.timestamp())
-    while True:
-        try:
-            blk, _ = await client.lookup_block(wc=-1, shard=-(2**63), utime=ts, only_archive=True)
-        except (LiteServerError, LiteClientError):
-            logger.debug(f"failed to get block for {date_} try again in 2 seconds")
-            await sleep(2)
-        else:
-            return blk
+from src.core.lite import get_masterchain_block, lite_client, retry_lite_query
 
 
 async def _get_stton_rate_for_block(client: LiteClientLike, block: BlockIdExt) -> float:
-    while True:
-        try:
-            result = await client.run_get_method(
-                address=settings.STTON_ADDRESS,
-                method="get_full_data",
-                stack=[],
-                block=block,
-            )
-        except (LiteServerError, LiteClientError):
-            logger.debug(f"failed to get block for {block} try again in 2 seconds")
-            await sleep(2)
-        else:
-            return cast(float, result[1] / result[0])
+    query = partial(
+        client.run_get_method, address=settings.STTON_ADDRESS, method="get_full_data", stack=[], block=block
+    )
+    result = await retry_lite_query(query, f"get_full_data of {settings.STTON_ADDRESS} at block {block.seqno}")
+    return cast(float, result[1] / result[0])
 
 
 async def get_stton_historical_prices(dates: Iterable[datetime]) -> AsyncGenerator[tuple[datetime, float], None]:
-    config = get_config()
-    async with LiteBalancer.from_config(config, trust_level=2) as client:
+    async with lite_client() as client:
         logger.debug("started balancer client")
         for date_ in dates:
             logger.debug(f"Processing date: {date_}")
-            block = await _get_block(client, date_)
+            block = await get_masterchain_block(client, date_)
             rate = await _get_stton_rate_for_block(client, block)
             yield date_, rate
 
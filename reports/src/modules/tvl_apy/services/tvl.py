@@ -1,8 +1,10 @@
 from datetime import datetime
+from typing import Any, cast
 
 import pandas as pd
 
 from src.core.http import send_request
+from src.core.json_extract import extract_json
 
 
 async def get_staking_tvl(*, protocol: str = "bemo", start_date: datetime, end_date: datetime) -> pd.DataFrame:
@@ -13,17 +15,29 @@ async def get_staking_tvl(*, protocol: str = "bemo", start_date: datetime, end_d
     return tvl[["month", "date", "TVL TON", "TVL USD"]]
 
 
-async def _get_defilama_tvl(protocol: str) -> pd.DataFrame:
-    response = await send_request(method="GET", url=f"https://api.llama.fi/protocol/{protocol}")
-
-    data = response.json()["chainTvls"]["TON"]
+async def get_defilama_ton_tvl(protocol: str) -> dict[str, Any]:
+    """`chainTvls.TON` of the DefiLlama protocol document: `tokens` and `tokensInUsd` series"""
+    response = await send_request(
+        method="GET", url=f"https://api.llama.fi/protocol/{protocol}", operation="defillama.protocol"
+    )
+    # only the TON subtree is kept, the other chains and the totals of the document are dropped while decoding
+    return cast(dict[str, Any], extract_json(response.text, "chainTvls", "TON"))
 
-    data_ton = pd.DataFrame(data["tokens"])
-    data_ton["date"] = pd.to_datetime(data_ton["date"], unit="s")
-    data_ton["TVL TON"] = data_ton["tokens"].apply(lambda x: x["TON"])
 
-    data_usd = pd.DataFrame(data["tokensInUsd"])
-    data_usd["date"] = pd.to_datetime(data_usd["date"], unit="s")
-    data_usd["TVL USD"] = data_usd["tokens"].apply(lambda x: x["TON"])
+async def _get_defilama_tvl(protocol: str) -> pd.DataFrame:
+    data = await get_defilama_ton_tvl(protocol)
+
+    data_ton = pd.DataFrame(
+        {
+            "date": pd.to_datetime([point["date"] for point in data["tokens"]], unit="s"),
+            "TVL TON": [point["tokens"]["TON"] for point in data["tokens"]],
+        }
+    )
+    data_usd = pd.DataFrame(
+        {
+            "date": pd.to_datetime([point["date"] for point in data["tokensInUsd"]], unit="s"),
+            "TVL USD": [point["tokens"]["TON"] for point in data["tokensInUsd"]],
+        }
+    )
 
     return pd.merge(data_ton, data_usd, on="date")
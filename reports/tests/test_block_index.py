@@ -0,0 +1,29 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.config import settings
+from src.core import block_index
+from src.core.block_index import BlockIndex, BlockSample, find_block
+
+
+@pytest.fixture(autouse=True)
+def _local_index(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "BLOCK_INDEX_PATH", tmp_path / "block_index.sqlite3")
+    monkeypatch.setattr(block_index, "block_index", BlockIndex())
+
+
+def test_find_block_looks_up_every_timestamp_once() -> None:
+    lookups: list[int] = []
+
+    async def lookup_block(timestamp: int) -> BlockSample:
+        lookups.append(timestamp)
+        return {"timestamp": timestamp, "block": timestamp // 12, "data": None}
+
+    async def find_blocks(timestamps: list[int]) -> list[int]:
+        return [(await find_block("eth", timestamp, lookup_block))["block"] for timestamp in timestamps]
+
+    # 1206 lies between two lookups answered with the same block
+    assert asyncio.run(find_blocks([1200, 1205, 1211, 1200, 1206, 1300])) == [100, 100, 100, 100, 100, 108]
+    assert lookups == [1200, 1205, 1211, 1300]
@@ -0,0 +1,72 @@
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from httpx import Request, Response
+
+from src.config import settings
+from src.core.http import cache
+from src.core.http.cache import IMMUTABLE, ResponseCache, ttl_for_window
+
+REQUEST = Request("GET", "https://upstream.test/")
+
+
+@pytest.fixture()
+def response_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ResponseCache:
+    monkeypatch.setattr(settings, "HTTP_CACHE_PATH", tmp_path / "http_cache.sqlite3")
+    return ResponseCache()
+
+
+def _at(monkeypatch: pytest.MonkeyPatch, timestamp: float) -> None:
+    monkeypatch.setattr(cache, "time", lambda: timestamp)
+
+
+def test_entries_expire_after_their_ttl(response_cache: ResponseCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    _at(monkeypatch, 1000)
+    response_cache.put("expiring", Response(200, json={"result": 1}), ttl=60)
+    response_cache.put("immutable", Response(200, json={"result": 2}), ttl=IMMUTABLE)
+
+    _at(monkeypatch, 1060)
+    cached = response_cache.get("expiring", REQUEST)
+    assert cached is not None
+    assert cached.json() == {"result": 1}
+
+    _at(monkeypatch, 1061)
+    assert response_cache.get("expiring", REQUEST) is None
+    _at(monkeypatch, 10**10)
+    assert response_cache.get("immutable", REQUEST) is not None
+
+
+def test_error_envelopes_are_not_cached(response_cache: ResponseCache) -> None:
+    response_cache.put("rate-limited", Response(200, json={"status": "0", "message": "NOTOK"}), ttl=IMMUTABLE)
+    response_cache.put("empty", Response(200, json={"status": "0", "message": "No transactions found"}), ttl=60)
+
+    assert response_cache.get("rate-limited", REQUEST) is None
+    assert response_cache.get("empty", REQUEST) is not None
+
+
+def test_least_recently_used_entries_are_evicted(
+    response_cache: ResponseCache, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "HTTP_CACHE_MAX_BYTES", 2500)
+    _at(monkeypatch, 1)
+    response_cache.put("first", Response(200, content=b"x" * 1000), ttl=IMMUTABLE)
+    _at(monkeypatch, 2)
+    response_cache.put("second", Response(200, content=b"x" * 1000), ttl=IMMUTABLE)
+    _at(monkeypatch, 3)
+    response_cache.get("first", REQUEST)
+
+    _at(monkeypatch, 4)
+    response_cache.put("third", Response(200, content=b"x" * 1000), ttl=IMMUTABLE)
+
+    assert response_cache.get("second", REQUEST) is None
+    assert response_cache.get("first", REQUEST) is not None
+    assert response_cache.get("third", REQUEST) is not None
+
+
+def test_only_settled_windows_are_cached_forever(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "HTTP_CACHE_SETTLE_SECONDS", 60 * 60)
+    now = datetime.now(UTC)
+
+    assert ttl_for_window(now - timedelta(hours=2)) == IMMUTABLE
+    assert ttl_for_window(now - timedelta(minutes=30)) is None
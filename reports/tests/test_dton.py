@@ -0,0 +1,18 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from src.config import settings
+from src.modules.transfers.services.dton import _split_window
+
+
+def test_split_window_keeps_the_inner_windows_when_now_moves(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DTON_WINDOW_SECONDS", 24 * 60 * 60)
+    start = datetime(2024, 1, 1, 12, tzinfo=UTC)
+
+    windows = _split_window(start, datetime(2024, 1, 4, 6, tzinfo=UTC))
+    later = _split_window(start, datetime(2024, 1, 4, 18, tzinfo=UTC))
+
+    assert windows[0] == (datetime(2024, 1, 4, tzinfo=UTC), datetime(2024, 1, 4, 6, tzinfo=UTC))
+    assert windows[-1] == (start, datetime(2024, 1, 1, 23, 59, 59, tzinfo=UTC))
+    assert windows[1:] == later[1:]
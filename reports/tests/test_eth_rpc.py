@@ -0,0 +1,24 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient, MockTransport, Request, Response
+
+from src.config import settings
+from src.core.eth_rpc import get_balance_call, rpc_batch
+from src.core.exceptions import RequestException
+from src.core.http import http_clients
+
+
+def test_rpc_batch_raises_on_answers_without_result(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def answer(request: Request) -> Response:
+        calls = json.loads(request.content)
+        # the second call comes back as an error entry without the error object
+        return Response(200, json=[{"jsonrpc": "2.0", "id": calls[0]["id"], "result": "0x1"}, {"id": calls[1]["id"]}])
+
+    monkeypatch.setattr(settings, "ETH_RPC_URL", "http://rpc.test/")
+    monkeypatch.setitem(http_clients._clients, "rpc.test", AsyncClient(transport=MockTransport(answer)))
+    calls = [get_balance_call("0x0000000000000000000000000000000000000001")] * 2
+
+    with pytest.raises(RequestException, match="call 1 answered without a result"):
+        asyncio.run(rpc_batch(calls))
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from src.config import settings
+from src.core.exceptions import RequestException
+from src.modules.transfers.dto import ETHTransfer, ETHTransfersList
+from src.modules.transfers.services import etherscan
+
+
+def _transfer(index: int, block: int) -> ETHTransfer:
+    return ETHTransfer.model_validate(
+        {
+            "blockNumber": str(block),
+            "timeStamp": str(block * 12),
+            "hash": f"0x{index}",
+            "nonce": "0",
+            "blockHash": f"0xb{block}",
+            "from": "0xfrom",
+            "contractAddress": "",
+            "to": "0xto",
+            "value": "1",
+            "transactionIndex": "0",
+            "gas": "21000",
+            "gasPrice": "1",
+            "gasUsed": "21000",
+            "cumulativeGasUsed": "21000",
+            "input": "0x",
+            "confirmations": "1",
+        }
+    )
+
+
+def _serve(monkeypatch: pytest.MonkeyPatch, blocks: list[int]) -> list[tuple[int, int, int]]:
+    """Etherscan answering with transfers in `blocks` and a cap of 3 pages of 2 rows, the queries are returned"""
+    transfers = [_transfer(index, block) for index, block in enumerate(blocks)]
+    queries: list[tuple[int, int, int]] = []
+
+    async def get_page(
+        action: str, address: str, start_block: int, end_block: int, page: int, page_size: int, cache_ttl: float | None
+    ) -> ETHTransfersList:
+        queries.append((start_block, end_block, page))
+        rows = [tx for tx in transfers if start_block <= int(tx.block_number) <= end_block]
+        return ETHTransfersList(rows[(page - 1) * page_size : page * page_size])
+
+    monkeypatch.setattr(settings, "ETHERSCAN_PAGE_SIZE", 2)
+    monkeypatch.setattr(etherscan, "ETHERSCAN_MAX_RESULTS", 6)
+    monkeypatch.setattr(etherscan, "_TARGET_WINDOW_RESULTS", 3)
+    monkeypatch.setattr(etherscan, "_get_page", get_page)
+    return queries
+
+
+async def _hashes(start_block: int, end_block: int) -> list[str]:
+    return [
+        tx.hash
+        async for chunk in etherscan.iter_etherscan_transactions("txlist", "0xaddress", start_block, end_block)
+        for tx in chunk.root
+    ]
+
+
+def test_transactions_are_paged_past_the_cap_without_gaps_or_duplicates(monkeypatch: pytest.MonkeyPatch) -> None:
+    # block 4 straddles the 6th row (the cap) of the first window
+    blocks = [1, 1, 2, 3, 4, 4, 4, 5, 6, 7, 8, 8, 9, 20]
+    queries = _serve(monkeypatch, blocks)
+
+    assert asyncio.run(_hashes(1, 30)) == [f"0x{index}" for index in range(len(blocks))]
+    # the window that reached the cap is continued from its last block
+    assert queries[:4] == [(1, 30, 1), (1, 30, 2), (1, 30, 3), (4, 5, 1)]
+
+
+def test_a_block_with_more_transactions_than_the_cap_is_an_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    _serve(monkeypatch, [1, 2, 2, 2, 2, 2, 2, 2])
+
+    with pytest.raises(RequestException):
+        asyncio.run(_hashes(2, 5))
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient, MockTransport, Request, Response
+
+from src.core.exceptions import CircuitOpenError
+from src.core.http import http_clients, send_request
+from src.core.http.retry import CircuitBreaker, CircuitState, circuit_breakers
+
+HOST = "upstream.test"
+URL = f"https://{HOST}/"
+
+
+@pytest.fixture()
+def half_open_breaker(monkeypatch: pytest.MonkeyPatch) -> CircuitBreaker:
+    breaker = CircuitBreaker(HOST, failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    monkeypatch.setitem(circuit_breakers, HOST, breaker)
+    return breaker
+
+
+def test_cancelled_probe_lets_the_next_request_probe(
+    half_open_breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def cancel(_: Request) -> Response:
+        raise asyncio.CancelledError
+
+    async def answer(_: Request) -> Response:
+        return Response(200)
+
+    monkeypatch.setitem(http_clients._clients, HOST, AsyncClient(transport=MockTransport(cancel)))
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(send_request("POST", URL, no_retries=True))
+    assert half_open_breaker.state is CircuitState.HALF_OPEN
+
+    monkeypatch.setitem(http_clients._clients, HOST, AsyncClient(transport=MockTransport(answer)))
+    assert asyncio.run(send_request("POST", URL, no_retries=True)).status_code == 200
+    assert half_open_breaker.failures == 0
+
+
+def test_cancelled_request_does_not_free_the_probe_of_another_one() -> None:
+    breaker = CircuitBreaker(HOST, failure_threshold=1, reset_timeout=0)
+    request = breaker.check()
+    breaker.record_failure()
+    probe = breaker.check()
+
+    breaker.release(request)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.release(probe)
+    assert breaker.check()
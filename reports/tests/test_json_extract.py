@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from src.core.json_extract import extract_json
+
+DOCUMENT = json.dumps(
+    {
+        "name": "bemo",
+        "tokens": [{"date": 1, "tokens": {"TON": 1.5}}],
+        "chainTvls": {"TON-staking": {"tokens": ['"}]']}, "TON": {"tokens": [{"date": 2, "tokens": {"TON": 3}}]}},
+    },
+    indent=2,
+)
+
+
+def test_extract_json_decodes_the_subtree_at_the_path() -> None:
+    assert extract_json(DOCUMENT, "chainTvls", "TON") == json.loads(DOCUMENT)["chainTvls"]["TON"]
+
+
+def test_extract_json_raises_key_error_for_a_missing_member() -> None:
+    with pytest.raises(KeyError):
+        extract_json(DOCUMENT, "chainTvls", "ETH")
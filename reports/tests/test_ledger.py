@@ -0,0 +1,74 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.core.dto import Wallet
+from src.modules.balances.services import ledger
+from src.modules.balances.services.ledger import (
+    CHANGES_COLUMNS,
+    Ledger,
+    get_historical_balances,
+)
+
+WALLET = Wallet(address="0xwallet", account_name="treasury")
+
+
+@pytest.fixture(autouse=True)
+def _local_ledger(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LEDGER_PATH", tmp_path / "ledger.sqlite3")
+    monkeypatch.setattr(settings, "LEDGER_RESYNC_SECONDS", 60 * 60)
+    monkeypatch.setattr(ledger, "ledger", Ledger())
+
+
+def _changes(*rows: tuple[str, float, float]) -> pd.DataFrame:
+    return pd.DataFrame(list(rows), columns=CHANGES_COLUMNS)
+
+
+def _is_about(date_: datetime | None, expected: datetime) -> bool:
+    return date_ is not None and abs((date_ - expected).total_seconds()) < 1
+
+
+def test_balances_at_subtracts_the_changes_since_the_next_checkpoint() -> None:
+    store = ledger.ledger
+    store.record(WALLET.address, "eth", 0, 100, _changes(("ETH", 50, 4), ("ETH", 80, -1), ("USDT", 90, 5)))
+    store.checkpoint(WALLET.address, "eth", 100, {"ETH": 10, "USDT": 5})
+    store.checkpoint(WALLET.address, "eth", 70, {"ETH": 11})
+
+    # the nearest later checkpoint is used, a change at the asked time is already in the balance
+    assert store.balances_at(WALLET.address, "eth", 60) == {"ETH": 11, "USDT": 0}
+    assert store.balances_at(WALLET.address, "eth", 50) == {"ETH": 7, "USDT": 0}
+    assert store.balances_at(WALLET.address, "eth", 101) == {}
+
+
+def test_only_the_windows_outside_the_synced_range_are_fetched() -> None:
+    now = datetime.now(UTC)
+    windows: list[tuple[datetime, datetime | None]] = []
+
+    async def fetch_changes(start: datetime, end: datetime | None) -> pd.DataFrame:
+        windows.append((start, end))
+        return _changes(*[("ETH", time.timestamp(), delta) for time, delta in history if start <= time])
+
+    history = [(now - timedelta(days=20), 2.0), (now - timedelta(days=5), 3.0), (now - timedelta(hours=2), -1.0)]
+
+    async def balance_at(target_date: datetime) -> float:
+        balances = await get_historical_balances(WALLET, "eth", target_date, {"ETH": 10}, fetch_changes)
+        return balances["ETH"]
+
+    assert asyncio.run(balance_at(now - timedelta(days=10))) == 8
+    # the whole range up to now is fetched open-ended
+    assert len(windows) == 1
+    assert _is_about(windows[0][0], now - timedelta(days=10))
+    assert windows[0][1] is None
+
+    windows.clear()
+    assert asyncio.run(balance_at(now - timedelta(days=30))) == 6
+    # the older range is backfilled up to the synced one and the tail is fetched again from before its end
+    (backfill_start, backfill_end), (tail_start, tail_end) = windows
+    assert _is_about(backfill_start, now - timedelta(days=30))
+    assert _is_about(backfill_end, now - timedelta(days=10))
+    assert _is_about(tail_start, now - timedelta(hours=1))
+    assert tail_end is None
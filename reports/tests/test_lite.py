@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from pytoniq import RunGetMethodError
+
+from src.config import RetryPolicy, settings
+from src.core.lite import retry_lite_query
+
+
+def test_retry_lite_query_retries_timeouts(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LITE_RETRY_POLICY", RetryPolicy(max_attempts=3, backoff_base=0))
+    attempts: list[int] = []
+
+    async def query() -> str:
+        attempts.append(len(attempts) + 1)
+        if len(attempts) < 3:
+            raise TimeoutError
+        return "block"
+
+    assert asyncio.run(retry_lite_query(query, "lookup_block")) == "block"
+    assert attempts == [1, 2, 3]
+
+
+def test_retry_lite_query_raises_get_method_errors_right_away(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LITE_RETRY_POLICY", RetryPolicy(max_attempts=3, backoff_base=0))
+    attempts: list[int] = []
+
+    async def query() -> str:
+        attempts.append(len(attempts) + 1)
+        raise RunGetMethodError(address="EQ", method="get_wallet_address", exit_code=11)
+
+    with pytest.raises(RunGetMethodError):
+        asyncio.run(retry_lite_query(query, "get_wallet_address"))
+    assert attempts == [1]
@@ -0,0 +1,19 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from src.core.exceptions import RequestException
+from src.modules.metrics import routers
+
+
+def test_metrics_render_upstream_metrics_when_tvl_fails(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def generate_tvl_metrics() -> pd.DataFrame:
+        raise RequestException("DefiLlama is down")
+
+    monkeypatch.setattr(routers, "generate_tvl_metrics", generate_tvl_metrics)
+
+    response = asyncio.run(routers.get_tvl_metrics())
+
+    assert response.status_code == 200
+    assert b"# TYPE upstream_request_duration_seconds histogram" in response.body
@@ -0,0 +1,42 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src.modules.transfers.services.ton import _remove_duplicates
+
+
+def _remove_duplicates_row_wise(df: pd.DataFrame) -> pd.DataFrame:
+    """the group-wise `apply` `_remove_duplicates` replaced, kept as the reference of its behavior"""
+
+    def process_group(group: pd.DataFrame) -> "pd.Series[Any]":
+        swapping_note = group[group["note"].str.startswith("Swapping")]
+        row = group.iloc[0].copy()
+        if len(group) > 1 and not swapping_note.empty:
+            row["note"] = swapping_note.iloc[0]["note"]
+        return row
+
+    df = df.assign(intvalue=df["value"].astype(int))
+    # the grouping columns are selected as well, they are part of the rows kept
+    grouped = df.groupby(["time", "account_name", "intvalue"], group_keys=False)[list(df.columns)]
+    return grouped.apply(process_group).reset_index(drop=True).drop(columns=["intvalue"])
+
+
+def test_remove_duplicates_matches_the_row_wise_implementation() -> None:
+    rng = np.random.default_rng(0)
+    size = 500
+    transfers = pd.DataFrame(
+        {
+            "time": pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 40, size), unit="s"),
+            "account_name": rng.choice(["treasury", "staking"], size),
+            "value": rng.choice([1.0, 1.25, 2.5, 7.0, 7.75], size),
+            "note": rng.choice(["", "transfer", "Swapping 1 TON", "Swapping 2 TON"], size),
+            "symbol": rng.choice(["TON", "stTON"], size),
+        }
+    ).sort_values(["account_name", "time"])
+
+    expected = _remove_duplicates_row_wise(transfers)
+    deduplicated = _remove_duplicates(transfers)
+
+    pd.testing.assert_frame_equal(deduplicated, expected, check_dtype=False)
+    assert deduplicated["note"].str.startswith("Swapping").sum() > 0
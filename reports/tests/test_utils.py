@@ -0,0 +1,35 @@
+from asyncio import CancelledError
+
+import pandas as pd
+import pytest
+from fastapi import Response
+
+from src.core.dto import Wallet
+from src.core.exceptions import RequestException
+from src.core.utils import collect_wallet_reports
+
+WALLETS = [Wallet(address="EQA-first", account_name="first"), Wallet(address="EQA-second", account_name="second")]
+
+
+def test_collect_wallet_reports_isolates_a_failed_wallet() -> None:
+    report = pd.DataFrame({"value": [1.0]})
+    response = Response()
+
+    reports = collect_wallet_reports(WALLETS, [RequestException("dton is down"), report], response)
+
+    assert reports == [report]
+    assert response.headers["X-Failed-Wallets"] == "EQA-first"
+
+
+def test_collect_wallet_reports_raises_when_every_wallet_failed() -> None:
+    error = RequestException("dton is down")
+
+    with pytest.raises(RequestException) as exc_info:
+        collect_wallet_reports(WALLETS, [error, RequestException("etherscan is down")], Response())
+
+    assert exc_info.value is error
+
+
+def test_collect_wallet_reports_stops_on_cancellation() -> None:
+    with pytest.raises(CancelledError):
+        collect_wallet_reports(WALLETS, [CancelledError(), pd.DataFrame()], Response())